@@ -46,5 +46,12 @@ class User(AbstractBaseUser, PermissionsMixin, TimeStampedModel):
     def __str__(self):
         return self.email
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the role as loaded; only a change to it moves the dashboard's per-role counts.
+        instance._loaded_role = instance.__dict__.get("role")
+        return instance
+
 
 USER_ROLE_CHOICES = User.Role.choices
@@ -1,10 +1,14 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+
+from common.authentication import get_profile_ids
+from common.serializers import TimedModelSerializer
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedModelSerializer):
     class Meta:
         model = User
         fields = (
@@ -20,7 +24,7 @@ class UserSerializer(serializers.ModelSerializer):
         read_only_fields = ("id", "created_at", "updated_at")
 
 
-class UserCreateSerializer(serializers.ModelSerializer):
+class UserCreateSerializer(TimedModelSerializer):
     password = serializers.CharField(write_only=True, min_length=8)
 
     class Meta:
@@ -33,7 +37,20 @@ class UserCreateSerializer(serializers.ModelSerializer):
         return User.objects.create_user(password=password, **validated_data)
 
 
-class UserStatusUpdateSerializer(serializers.ModelSerializer):
+class UserStatusUpdateSerializer(TimedModelSerializer):
     class Meta:
         model = User
         fields = ("is_active",)
+
+
+class HospitalTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Adds role and profile-id claims for clients; views scope on the cached user's ids instead."""
+
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        doctor_id, patient_id = get_profile_ids(user)
+        token["role"] = user.role
+        token["doctor_id"] = doctor_id
+        token["patient_id"] = patient_id
+        return token
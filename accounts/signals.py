@@ -0,0 +1,43 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from common.authentication import invalidate_cached_user
+from common.cache import bump_version
+
+User = get_user_model()
+
+
+def bump_dashboard():
+    bump_version("dashboard_overview")
+    # Again after commit, in case another worker re-cached the old counts in between.
+    transaction.on_commit(lambda: bump_version("dashboard_overview"))
+
+
+# The dashboard counts users by role; logins and profile edits leave it as it is.
+@receiver(post_save, sender=User)
+def invalidate_dashboard_on_role_change(sender, instance, created, **kwargs):
+    if created or instance.role != getattr(instance, "_loaded_role", None):
+        bump_dashboard()
+    instance._loaded_role = instance.role
+
+
+@receiver(post_delete, sender=User)
+def invalidate_dashboard_cache(*args, **kwargs):
+    bump_dashboard()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_authenticated_user(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+# Profile ids travel with the cached user, so a new or removed profile must refresh it.
+@receiver(post_save, sender="doctors.Doctor")
+@receiver(post_delete, sender="doctors.Doctor")
+@receiver(post_save, sender="patients.Patient")
+@receiver(post_delete, sender="patients.Patient")
+def invalidate_profile_owner(sender, instance, **kwargs):
+    invalidate_cached_user(instance.user_id)
@@ -3,7 +3,12 @@ from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
-from .serializers import UserCreateSerializer, UserSerializer, UserStatusUpdateSerializer
+from .serializers import (
+    HospitalTokenObtainPairSerializer,
+    UserCreateSerializer,
+    UserSerializer,
+    UserStatusUpdateSerializer,
+)
 from common.permissions import IsAdminRole
 
 User = get_user_model()
@@ -11,6 +16,7 @@ User = get_user_model()
 
 class LoginView(TokenObtainPairView):
     permission_classes = [permissions.AllowAny]
+    serializer_class = HospitalTokenObtainPairSerializer
 
 
 class RefreshView(TokenRefreshView):
@@ -22,7 +28,7 @@ class MeView(generics.GenericAPIView):
     serializer_class = UserSerializer
 
     def get(self, request):
-        return Response(UserSerializer(request.user).data)
+        return Response(self.get_serializer(request.user).data)
 
 
 class PatientSignupView(generics.CreateAPIView):
@@ -36,7 +42,7 @@ class PatientSignupView(generics.CreateAPIView):
 
 class UserListCreateView(generics.ListCreateAPIView):
     permission_classes = [IsAdminRole]
-    queryset = User.objects.all().order_by("-created_at")
+    queryset = User.objects.all().order_by("-created_at", "-id")
 
     def get_serializer_class(self):
         return UserCreateSerializer if self.request.method == "POST" else UserSerializer
@@ -62,4 +68,4 @@ class UserStatusUpdateView(generics.UpdateAPIView):
         serializer = self.get_serializer(instance, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save()
-        return Response(UserSerializer(instance).data, status=status.HTTP_200_OK)
+        return Response(UserSerializer(instance, context={"request": request}).data, status=status.HTTP_200_OK)
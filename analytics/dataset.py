@@ -0,0 +1,335 @@
+"""Synthetic hospital data at production scale for load tests and benchmarks (manage.py generate_dataset)."""
+
+import random
+import secrets
+from contextlib import contextmanager
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import groupby, islice, product
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import User
+from appointments.models import Appointment
+from billing.models import DailyRevenue, Invoice, invalidate_revenue_caches
+from common.cache import bump_version
+from doctors.models import Doctor, WorkingHours
+from medicines.models import Medicine, MedicinePriceHistory, SystemSettings
+from medicines.search import SEARCH_CACHE
+from patients.models import Patient
+from prescriptions.models import Prescription, PrescriptionItem
+
+# Appointments sit on a grid of 30-minute slots, 09:00-17:00 local time on the doctors'
+# working days, so two bookings overlap exactly when they share a slot; that makes the
+# no-overlap rule cheap to honour.
+SLOT = timedelta(minutes=30)
+DAY_START = time(9)
+SLOTS_PER_DAY = 16
+WORKING_WEEKDAYS = range(6)  # Monday to Saturday, as in the generated WorkingHours
+
+SPECIALIZATIONS = [
+    "General Medicine", "Cardiology", "Dermatology", "Orthopedics", "Pediatrics",
+    "Neurology", "ENT", "Gynecology", "Psychiatry", "Ophthalmology",
+]
+GENERICS = [
+    "Paracetamol", "Amoxicillin", "Cetirizine", "Azithromycin", "Omeprazole", "Metformin", "Ibuprofen",
+    "Atorvastatin", "Amlodipine", "Losartan", "Pantoprazole", "Montelukast", "Levocetirizine", "Doxycycline",
+    "Ciprofloxacin", "Diclofenac", "Ranitidine", "Glimepiride", "Telmisartan", "Rosuvastatin",
+]
+STRENGTHS = [5, 10, 20, 250, 500, 650]
+MANUFACTURERS = ["Cipla", "Sun Pharma", "Zydus", "Dr Reddy", "Lupin", "Mankind", "Alkem", "Torrent"]
+DIAGNOSES = [
+    ("Viral Fever", "Take rest and stay hydrated"),
+    ("Hypertension", "Avoid salt, take medicines regularly"),
+    ("Diabetes Type 2", "Monitor blood sugar daily"),
+    ("Migraine", "Avoid bright light and noise"),
+    ("Common Cold", "Steam inhalation, warm fluids"),
+    ("Back Pain", "Physiotherapy recommended, avoid lifting"),
+    ("Skin Allergy", "Avoid allergen, apply cream as directed"),
+    ("Asthma", "Carry inhaler always, avoid triggers"),
+]
+REASONS = ["Regular checkup", "Follow-up visit", "Fever and cough", "Joint pain", "Skin rash", "Diabetes review"]
+DOSAGES = ["250mg", "500mg", "10mg", "5ml", "1 tablet", "2 tablets"]
+FREQUENCIES = ["Once daily", "Twice daily", "Thrice daily", "At bedtime", "SOS"]
+PAYMENT_METHODS = ["UPI", "CARD", "CASH", "NET_BANKING"]
+
+# Past appointments by outcome (the rest are no-shows), future ones cancelled in advance, and
+# completed ones that end in a prescription and invoice.
+PAST_STATUSES = [(Appointment.Status.COMPLETED, 0.78), (Appointment.Status.CANCELLED, 0.12)]
+FUTURE_CANCELLED = 0.08
+PRESCRIBED = 0.9
+# Invoice outcomes (the rest stay pending); bills from the last week are more often unpaid.
+INVOICE_STATUSES = [(Invoice.Status.PAID, 0.72), (Invoice.Status.VOID, 0.03)]
+RECENT_INVOICE_STATUSES = [(Invoice.Status.PAID, 0.4), (Invoice.Status.VOID, 0.02)]
+
+
+MAX_MEDICINES = len(GENERICS) * len(STRENGTHS) * len(MANUFACTURERS)
+
+
+def working_days(days, today=None):
+    """The working days of the `days`-long window, about a fifth of which lies after `today`."""
+    first_day = (today or timezone.localdate()) - timedelta(days=days - days // 5)
+    window = (first_day + timedelta(days=offset) for offset in range(days))
+    return [day for day in window if day.weekday() in WORKING_WEEKDAYS]
+
+
+def capacity(doctors, days, today=None):
+    """Most appointments `doctors` can take in `days` without any of them overlapping."""
+    return doctors * len(working_days(days, today)) * SLOTS_PER_DAY
+
+
+@contextmanager
+def explicit_timestamps(*models):
+    """Let bulk_create keep the created_at/updated_at we set instead of stamping them now."""
+    fields = [model._meta.get_field(name) for model in models for name in ("created_at", "updated_at")]
+    saved = [(field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, (auto_now, auto_now_add) in zip(fields, saved):
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def _pick(rng, weighted, default):
+    roll = rng.random()
+    for value, share in weighted:
+        if roll < share:
+            return value
+        roll -= share
+    return default
+
+
+class DatasetGenerator:
+    """Bulk-insert doctors, patients, medicines and `appointments` spread over `days`.
+
+    About a fifth of the window lies in the future. Past appointments are mostly completed,
+    and most completed ones carry a prescription and an invoice, priced as the API would
+    price them. Each chunk is a few multi-row INSERTs in one transaction, and every user
+    shares a single password hash. Neither doctors nor patients are ever double-booked.
+    bulk_create skips save() and signals, so the revenue rollup and the caches are
+    refreshed once at the end.
+    """
+
+    def __init__(self, doctors, patients, appointments, days, medicines=100, chunk_size=5000,
+                 password="password123", seed=None, log=None):
+        self.doctors, self.patients, self.appointments, self.days = doctors, patients, appointments, days
+        self.medicines, self.chunk_size, self.password = medicines, chunk_size, password
+        self.rng = random.Random(seed)
+        # Keeps emails, licences and catalog keys unique across repeated runs.
+        self.tag = secrets.token_hex(4)
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+        self.first_day = timezone.localdate(self.now) - timedelta(days=days - days // 5)
+        self.working_days = working_days(days, timezone.localdate(self.now))
+        self.counts = dict.fromkeys(
+            ["doctors", "patients", "medicines", "appointments", "prescriptions", "invoices"], 0
+        )
+
+    def run(self):
+        self.password_hash = make_password(self.password)
+        self.catalog = self.create_medicines()
+        self.doctor_rows = self.create_doctors()
+        self.patient_ids = self.create_patients()
+        self.discount_percent = SystemSettings.get_settings().discount_percent
+        with explicit_timestamps(Appointment, Prescription, PrescriptionItem, Invoice):
+            for chunk in self.appointment_chunks():
+                self.create_visits(chunk)
+        DailyRevenue.objects.rebuild(self.first_day, self.first_day + timedelta(days=self.days))
+        invalidate_revenue_caches()
+        return self.counts
+
+    def chunks(self, iterable):
+        iterator = iter(iterable)
+        while chunk := list(islice(iterator, self.chunk_size)):
+            yield chunk
+
+    def create_users(self, role, count):
+        """Users for one role, in chunks; returns their ids in creation order."""
+        ids = []
+        prefix = role.lower()
+        for chunk in self.chunks(range(count)):
+            users = User.objects.bulk_create([
+                User(
+                    email=f"{prefix}{i}.{self.tag}@example.test",
+                    full_name=f"{role.title()} {i} {self.tag}",
+                    role=role,
+                    password=self.password_hash,
+                )
+                for i in chunk
+            ])
+            ids.extend(user.pk for user in users)
+        return ids
+
+    def create_medicines(self):
+        """Add `medicines` catalog entries; returns (id, price, tax_percent) of every active medicine."""
+        keys = list(islice(product(GENERICS, STRENGTHS, MANUFACTURERS), self.medicines))
+        if keys:
+            created = Medicine.objects.bulk_create([
+                Medicine(
+                    name=f"{generic} {strength}mg",
+                    generic_name=generic,
+                    manufacturer=f"{manufacturer} {self.tag}",
+                    price=Decimal(self.rng.randrange(10, 500)),
+                    tax_percent=self.rng.choice([Decimal(5), Decimal(12), Decimal(18)]),
+                )
+                for generic, strength, manufacturer in keys
+            ])
+            MedicinePriceHistory.objects.record(created)
+            bump_version(SEARCH_CACHE)
+            self.counts["medicines"] = len(created)
+        return list(Medicine.objects.filter(is_active=True).values_list("id", "price", "tax_percent"))
+
+    def create_doctors(self):
+        """Doctors with Mon-Sat working hours; returns (doctor id, user id, fee) rows."""
+        rows = []
+        user_ids = self.create_users(User.Role.DOCTOR, self.doctors)
+        for chunk in self.chunks(enumerate(user_ids)):
+            doctors = Doctor.objects.bulk_create([
+                Doctor(
+                    user_id=user_id,
+                    specialization=self.rng.choice(SPECIALIZATIONS),
+                    license_number=f"GEN-{self.tag}-{i:07d}",
+                    years_experience=self.rng.randint(1, 35),
+                    consultation_fee=Decimal(self.rng.randrange(300, 1050, 50)),
+                )
+                for i, user_id in chunk
+            ])
+            WorkingHours.objects.bulk_create([
+                WorkingHours(doctor=doctor, weekday=weekday, start_time=DAY_START, end_time=time(17))
+                for doctor in doctors
+                for weekday in WORKING_WEEKDAYS
+            ])
+            rows.extend((doctor.pk, doctor.user_id, doctor.consultation_fee) for doctor in doctors)
+        self.counts["doctors"] = len(rows)
+        return rows
+
+    def create_patients(self):
+        ids = []
+        user_ids = self.create_users(User.Role.PATIENT, self.patients)
+        for chunk in self.chunks(user_ids):
+            patients = Patient.objects.bulk_create([
+                Patient(
+                    user_id=user_id,
+                    gender=self.rng.choice(Patient.Gender.values),
+                    date_of_birth=self.first_day - timedelta(days=self.rng.randint(365, 85 * 365)),
+                    blood_group=self.rng.choice(["A+", "A-", "B+", "B-", "O+", "O-", "AB+", "AB-"]),
+                )
+                for user_id in chunk
+            ])
+            ids.extend(patient.pk for patient in patients)
+        self.counts["patients"] = len(ids)
+        return ids
+
+    def appointment_chunks(self):
+        """Unsaved appointments in start-time order, `chunk_size` at a time.
+
+        Each (slot, doctor) cell of the grid is drawn at most once, and the doctors sharing
+        a slot get distinct patients, so neither side is ever double-booked.
+        """
+        doctors = len(self.doctor_rows)
+        cells = sorted(self.rng.sample(range(doctors * len(self.working_days) * SLOTS_PER_DAY), self.appointments))
+
+        def visits():
+            for slot, group in groupby(cells, key=lambda cell: cell // doctors):
+                group = list(group)
+                for cell, patient_id in zip(group, self.rng.sample(self.patient_ids, len(group))):
+                    yield self.appointment(slot, self.doctor_rows[cell % doctors][0], patient_id)
+
+        return self.chunks(visits())
+
+    def appointment(self, slot, doctor_id, patient_id):
+        day = self.working_days[slot // SLOTS_PER_DAY]
+        start = timezone.make_aware(datetime.combine(day, DAY_START)) + SLOT * (slot % SLOTS_PER_DAY)
+        end = start + SLOT
+        booked = min(self.now, start - timedelta(hours=self.rng.randint(1, 14 * 24)))
+        if end <= self.now:
+            status = _pick(self.rng, PAST_STATUSES, Appointment.Status.NO_SHOW)
+        else:
+            cancelled = self.rng.random() < FUTURE_CANCELLED
+            status = Appointment.Status.CANCELLED if cancelled else Appointment.Status.SCHEDULED
+        return Appointment(
+            doctor_id=doctor_id,
+            patient_id=patient_id,
+            start_time=start,
+            end_time=end,
+            reason=self.rng.choice(REASONS),
+            status=status,
+            created_at=booked,
+            updated_at=booked if status == Appointment.Status.SCHEDULED else min(self.now, end),
+        )
+
+    @transaction.atomic
+    def create_visits(self, appointments):
+        """Insert one chunk of appointments with their prescriptions, items and invoices."""
+        appointments = Appointment.objects.bulk_create(appointments)
+        fees = {doctor_id: (user_id, fee) for doctor_id, user_id, fee in self.doctor_rows}
+        prescribed = [
+            appointment for appointment in appointments
+            if appointment.status == Appointment.Status.COMPLETED and self.rng.random() < PRESCRIBED
+        ]
+        prescriptions = []
+        for appointment in prescribed:
+            diagnosis, instructions = self.rng.choice(DIAGNOSES)
+            prescriptions.append(Prescription(
+                appointment_id=appointment.pk,
+                diagnosis=diagnosis,
+                instructions=instructions,
+                created_by_id=fees[appointment.doctor_id][0],
+                created_at=appointment.end_time,
+                updated_at=appointment.end_time,
+            ))
+        prescriptions = Prescription.objects.bulk_create(prescriptions)
+
+        items, invoices = [], []
+        for appointment, prescription in zip(prescribed, prescriptions):
+            medicine_total = tax = Decimal(0)
+            lines = self.rng.sample(self.catalog, min(len(self.catalog), self.rng.randint(1, 4)))
+            for medicine_id, price, tax_percent in lines:
+                item = PrescriptionItem(
+                    prescription_id=prescription.pk,
+                    medicine_id=medicine_id,
+                    quantity=self.rng.randint(1, 3),
+                    dosage=self.rng.choice(DOSAGES),
+                    frequency=self.rng.choice(FREQUENCIES),
+                    duration_days=self.rng.randint(3, 10),
+                    unit_price=price,
+                    tax_percent=tax_percent,
+                    created_at=prescription.created_at,
+                    updated_at=prescription.created_at,
+                )
+                medicine_total += item.line_total
+                tax += item.line_tax
+                items.append(item)
+            invoices.append(self.invoice(appointment, fees[appointment.doctor_id][1], medicine_total, tax))
+        PrescriptionItem.objects.bulk_create(items)
+        Invoice.objects.bulk_create(invoices)
+
+        self.counts["appointments"] += len(appointments)
+        self.counts["prescriptions"] += len(prescriptions)
+        self.counts["invoices"] += len(invoices)
+        self.log(f"{self.counts['appointments']}/{self.appointments} appointments")
+
+    def invoice(self, appointment, fee, medicine_total, tax):
+        issued = appointment.end_time
+        recent = issued > self.now - timedelta(days=7)
+        status = _pick(self.rng, RECENT_INVOICE_STATUSES if recent else INVOICE_STATUSES, Invoice.Status.PENDING)
+        invoice = Invoice(
+            appointment_id=appointment.pk,
+            consultation_fee=fee,
+            medicine_total=medicine_total,
+            tax=tax,
+            discount_percent=self.discount_percent,
+            status=status,
+            created_at=issued,
+            updated_at=issued,
+        )
+        if status == Invoice.Status.PAID:
+            invoice.paid_at = invoice.updated_at = min(self.now, issued + timedelta(hours=self.rng.randint(0, 72)))
+            invoice.payment_method = self.rng.choice(PAYMENT_METHODS)
+        # The same totals Invoice.save() would store.
+        invoice.calculate_totals()
+        return invoice
@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from analytics.dataset import MAX_MEDICINES, DatasetGenerator, capacity
+from medicines.models import Medicine
+
+
+class Command(BaseCommand):
+    help = "Bulk-generate synthetic doctors, patients, appointments, prescriptions and invoices for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--doctors", type=int, default=50)
+        parser.add_argument("--patients", type=int, default=2000)
+        parser.add_argument("--appointments", type=int, default=10000)
+        parser.add_argument("--days", type=int, default=90, help="Window length; about a fifth lies in the future")
+        parser.add_argument("--medicines", type=int, default=100, help=f"New catalog entries, at most {MAX_MEDICINES}")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Appointments per transaction")
+        parser.add_argument("--password", default="password123", help="Shared by every generated user")
+        parser.add_argument("--seed", type=int, help="Make the generated distribution reproducible")
+
+    def handle(self, *args, doctors, patients, appointments, days, medicines, chunk_size, password, seed, **options):
+        if min(doctors, patients, days, chunk_size) < 1 or min(appointments, medicines) < 0:
+            raise CommandError("Counts must not be negative; --doctors, --patients, --days and --chunk-size at least 1")
+        if patients < doctors:
+            raise CommandError("--patients must be at least --doctors, or patients would be double-booked")
+        if appointments > capacity(doctors, days):
+            raise CommandError(
+                f"{doctors} doctors can take at most {capacity(doctors, days)} non-overlapping appointments "
+                f"in {days} days (Sundays off); raise --doctors or --days"
+            )
+        if medicines > MAX_MEDICINES:
+            raise CommandError(f"--medicines must be at most {MAX_MEDICINES}")
+        if not medicines and not Medicine.objects.filter(is_active=True).exists():
+            raise CommandError("The catalog has no active medicines to prescribe; pass --medicines")
+
+        started = time.monotonic()
+        counts = DatasetGenerator(
+            doctors, patients, appointments, days, medicines=medicines, chunk_size=chunk_size,
+            password=password, seed=seed, log=self.progress if options["verbosity"] > 1 else None,
+        ).run()
+        summary = ", ".join(f"{count} {name}" for name, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f"Created {summary} in {time.monotonic() - started:.1f}s"))
+
+    def progress(self, message):
+        self.stdout.write(message)
@@ -1,8 +1,73 @@
+from datetime import timedelta
+
+from django.utils import timezone
 from rest_framework import serializers
 
+from common.serializers import TimedSerializer
+
 
-class DashboardOverviewSerializer(serializers.Serializer):
+class DashboardOverviewSerializer(TimedSerializer):
     users_by_role = serializers.DictField(child=serializers.IntegerField())
     appointments_by_status = serializers.DictField(child=serializers.IntegerField())
     revenue_paid_total = serializers.CharField()
     total_invoices = serializers.IntegerField()
+    paid_count = serializers.IntegerField()
+    pending_count = serializers.IntegerField()
+    pending_amount = serializers.CharField()
+
+
+class DateRangeQuerySerializer(TimedSerializer):
+    default_days = 365
+
+    # "from" is a keyword, so the field is renamed in get_fields() below.
+    from_ = serializers.DateField(required=False, help_text="Defaults to `default_days` before `to`")
+    to = serializers.DateField(required=False, help_text="Inclusive; defaults to today")
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fields["from"] = fields.pop("from_")
+        return fields
+
+    def validate(self, attrs):
+        attrs["to"] = attrs.get("to") or timezone.localdate()
+        attrs["from"] = attrs.get("from") or attrs["to"] - timedelta(days=self.default_days)
+        if attrs["to"] < attrs["from"]:
+            raise serializers.ValidationError({"to": "to must not be before from"})
+        return attrs
+
+
+class RevenueSeriesQuerySerializer(DateRangeQuerySerializer):
+    granularity = serializers.ChoiceField(choices=["day", "week", "month"], default="day")
+    group_by = serializers.ChoiceField(choices=["doctor", "specialization"], required=False)
+
+
+class RevenueBucketSerializer(TimedSerializer):
+    period = serializers.DateField()
+    group = serializers.CharField(required=False, help_text="Doctor id or specialization when grouped")
+    group_name = serializers.CharField(required=False)
+    paid_total = serializers.CharField()
+    paid_count = serializers.IntegerField()
+    pending_total = serializers.CharField()
+    pending_count = serializers.IntegerField()
+
+
+class UtilizationQuerySerializer(DateRangeQuerySerializer):
+    default_days = 30
+
+    peak_hours = serializers.IntegerField(min_value=1, max_value=24, default=3)
+
+
+class PeakHourSerializer(TimedSerializer):
+    hour = serializers.IntegerField()
+    appointments = serializers.IntegerField()
+
+
+class DoctorUtilizationSerializer(TimedSerializer):
+    doctor = serializers.IntegerField()
+    doctor_name = serializers.CharField()
+    appointments = serializers.IntegerField()
+    booked_minutes = serializers.FloatField()
+    idle_minutes = serializers.FloatField(help_text="Gaps between consecutive same-day appointments")
+    idle_gaps = serializers.IntegerField()
+    no_show_rate = serializers.FloatField(allow_null=True, help_text="NO_SHOW / (COMPLETED + NO_SHOW)")
+    peak_hours = PeakHourSerializer(many=True)
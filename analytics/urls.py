@@ -1,7 +1,9 @@
 from django.urls import path
 
-from .views import DashboardOverviewView
+from .views import DashboardOverviewView, DoctorUtilizationView, RevenueSeriesView
 
 urlpatterns = [
     path("dashboard/overview/", DashboardOverviewView.as_view(), name="dashboard-overview"),
+    path("analytics/revenue/", RevenueSeriesView.as_view(), name="analytics-revenue"),
+    path("analytics/utilization/", DoctorUtilizationView.as_view(), name="analytics-utilization"),
 ]
@@ -1,44 +1,160 @@
+from datetime import datetime, time, timedelta
 from decimal import Decimal
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.db.models import Count, Sum
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import ExtractHour, TruncDate, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
 from drf_spectacular.utils import extend_schema
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from appointments.models import Appointment
-from billing.models import Invoice
+from billing.models import DailyRevenue, Invoice
+from common.cache import versioned_key
 from common.permissions import IsAdminRole
+from doctors.models import Doctor
 
-from .serializers import DashboardOverviewSerializer
+from .serializers import (
+    DashboardOverviewSerializer,
+    DoctorUtilizationSerializer,
+    RevenueBucketSerializer,
+    RevenueSeriesQuerySerializer,
+    UtilizationQuerySerializer,
+)
+from .utilization import doctor_utilization, to_columns
 
 User = get_user_model()
 
+# Bumped (now and on commit) by the signals of Appointment, Invoice and User role changes.
+DASHBOARD_CACHE = "dashboard_overview"
+# Bumped by the Invoice signals.
+REVENUE_CACHE = "revenue_series"
+
+
+def money(value):
+    """Format a possibly-NULL SUM() the same way on every backend."""
+    return str(Decimal(value or 0).quantize(Decimal("0.01")))
+
 
 class DashboardOverviewView(APIView):
+    query_budget = 5
     permission_classes = [IsAuthenticated, IsAdminRole]
 
     @extend_schema(responses=DashboardOverviewSerializer)
     def get(self, request):
-        # Skip cache so payments reflect immediately
-        users_by_role = {row["role"]: row["total"] for row in User.objects.values("role").annotate(total=Count("id"))}
-        appointments_by_status = {
-            row["status"]: row["total"] for row in Appointment.objects.values("status").annotate(total=Count("id"))
-        }
+        # Cached per data version, so payments still reflect immediately
+        key = versioned_key(DASHBOARD_CACHE)
+        payload = cache.get(key)
+        if payload is None:
+            payload = self.compute_overview()
+            cache.set(key, payload, settings.CACHE_TTL_SECONDS)
+        return Response(payload)
 
-        paid_agg = Invoice.objects.filter(status="PAID").aggregate(total=Sum("total_amount"), count=Count("id"))
-        pending_agg = Invoice.objects.filter(status="PENDING").aggregate(total=Sum("total_amount"), count=Count("id"))
+    @staticmethod
+    def compute_overview():
+        """One conditional-aggregation query per table; invoice totals come from the daily rollup."""
+        users_by_role = User.objects.aggregate(
+            **{role: Count("id", filter=Q(role=role)) for role in User.Role.values}
+        )
+        appointments_by_status = Appointment.objects.aggregate(
+            **{status: Count("id", filter=Q(status=status)) for status in Appointment.Status.values}
+        )
+        paid = Q(status=Invoice.Status.PAID)
+        pending = Q(status=Invoice.Status.PENDING)
+        invoices = DailyRevenue.objects.aggregate(
+            total_invoices=Sum("invoice_count"),
+            paid_count=Sum("invoice_count", filter=paid),
+            paid_total=Sum("total_amount", filter=paid),
+            pending_count=Sum("invoice_count", filter=pending),
+            pending_total=Sum("total_amount", filter=pending),
+        )
 
-        payload = {
+        return {
             "users_by_role": users_by_role,
             "appointments_by_status": appointments_by_status,
-            "revenue_paid_total": str(Decimal(paid_agg["total"] or 0)),
-            "total_invoices": Invoice.objects.count(),
-            "paid_count": paid_agg["count"] or 0,
-            "pending_count": pending_agg["count"] or 0,
-            "pending_amount": str(Decimal(pending_agg["total"] or 0)),
+            "revenue_paid_total": money(invoices["paid_total"]),
+            "total_invoices": invoices["total_invoices"] or 0,
+            "paid_count": invoices["paid_count"] or 0,
+            "pending_count": invoices["pending_count"] or 0,
+            "pending_amount": money(invoices["pending_total"]),
         }
+
+
+class RevenueSeriesView(APIView):
+    """Paid and pending revenue per day, week or month, optionally per doctor or specialization."""
+    permission_classes = [IsAuthenticated, IsAdminRole]
+    truncs = {"day": TruncDay, "week": TruncWeek, "month": TruncMonth}
+    groups = {
+        "doctor": {"group": F("doctor_id"), "group_name": F("doctor__user__full_name")},
+        "specialization": {"group": F("doctor__specialization")},
+    }
+
+    @extend_schema(parameters=[RevenueSeriesQuerySerializer], responses=RevenueBucketSerializer(many=True))
+    def get(self, request):
+        params = RevenueSeriesQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        filters = params.validated_data
+        key = versioned_key(
+            REVENUE_CACHE, filters["granularity"], filters.get("group_by", ""), filters["from"], filters["to"]
+        )
+        payload = cache.get(key)
+        if payload is None:
+            payload = self.compute_series(filters)
+            cache.set(key, payload, settings.CACHE_TTL_SECONDS)
         return Response(payload)
+
+    def compute_series(self, filters):
+        """Bucket the daily rollup in the database; a year of daily rows is at most 365 x doctors x 3."""
+        paid = Q(status=Invoice.Status.PAID)
+        pending = Q(status=Invoice.Status.PENDING)
+        rows = (
+            DailyRevenue.objects.filter(date__gte=filters["from"], date__lte=filters["to"])
+            .values(period=self.truncs[filters["granularity"]]("date"), **self.groups.get(filters.get("group_by"), {}))
+            .annotate(
+                paid_total=Sum("total_amount", filter=paid),
+                paid_count=Sum("invoice_count", filter=paid),
+                pending_total=Sum("total_amount", filter=pending),
+                pending_count=Sum("invoice_count", filter=pending),
+            )
+            .order_by("period", *self.groups.get(filters.get("group_by"), {}))
+        )
+        return [
+            {
+                **row,
+                "paid_total": money(row["paid_total"]),
+                "paid_count": row["paid_count"] or 0,
+                "pending_total": money(row["pending_total"]),
+                "pending_count": row["pending_count"] or 0,
+            }
+            for row in rows
+        ]
+
+
+class DoctorUtilizationView(APIView):
+    """Booked minutes, idle gaps, no-show rate and peak hours per doctor over a window."""
+    permission_classes = [IsAuthenticated, IsAdminRole]
+
+    @extend_schema(parameters=[UtilizationQuerySerializer], responses=DoctorUtilizationSerializer(many=True))
+    def get(self, request):
+        params = UtilizationQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        filters = params.validated_data
+        tz = timezone.get_current_timezone()
+        rows = (
+            Appointment.objects.filter(
+                start_time__gte=datetime.combine(filters["from"], time.min, tzinfo=tz),
+                start_time__lt=datetime.combine(filters["to"] + timedelta(days=1), time.min, tzinfo=tz),
+            )
+            .order_by("doctor_id", "start_time")
+            .values_list("doctor_id", "start_time", "end_time", "status", TruncDate("start_time"), ExtractHour("start_time"))
+        )
+        metrics = doctor_utilization(to_columns(list(rows)), filters["peak_hours"])
+        names = dict(Doctor.objects.filter(id__in=metrics).values_list("id", "user__full_name"))
+        return Response([
+            {"doctor": doctor_id, "doctor_name": names.get(doctor_id, ""), **values}
+            for doctor_id, values in metrics.items()
+        ])
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0001_initial'),
+        ('doctors', '0001_initial'),
+        ('patients', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['-start_time', '-id'], name='appointment_start_id_idx'),
+        ),
+    ]
@@ -0,0 +1,71 @@
+from django.db import migrations
+
+CREATE_SQL = """
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+ALTER TABLE appointments_appointment
+    ADD CONSTRAINT appointment_doctor_no_overlap
+    EXCLUDE USING gist (doctor_id WITH =, tstzrange(start_time, end_time, '[)') WITH &&)
+    WHERE (status <> 'CANCELLED');
+ALTER TABLE appointments_appointment
+    ADD CONSTRAINT appointment_patient_no_overlap
+    EXCLUDE USING gist (patient_id WITH =, tstzrange(start_time, end_time, '[)') WITH &&)
+    WHERE (status <> 'CANCELLED');
+"""
+
+# Live appointments that already overlap would make ADD CONSTRAINT fail half-way through.
+OVERLAPS_SQL = """
+SELECT a.id, b.id
+FROM appointments_appointment a
+JOIN appointments_appointment b
+    ON a.{column} = b.{column} AND a.id < b.id
+    AND tstzrange(a.start_time, a.end_time, '[)') && tstzrange(b.start_time, b.end_time, '[)')
+WHERE a.status <> 'CANCELLED' AND b.status <> 'CANCELLED'
+ORDER BY a.id, b.id
+LIMIT 20
+"""
+
+DROP_SQL = """
+ALTER TABLE appointments_appointment DROP CONSTRAINT IF EXISTS appointment_patient_no_overlap;
+ALTER TABLE appointments_appointment DROP CONSTRAINT IF EXISTS appointment_doctor_no_overlap;
+"""
+
+
+def find_overlaps(connection):
+    overlaps = {}
+    with connection.cursor() as cursor:
+        for column in ("doctor_id", "patient_id"):
+            cursor.execute(OVERLAPS_SQL.format(column=column))
+            if rows := cursor.fetchall():
+                overlaps[column] = rows
+    return overlaps
+
+
+def add_exclusion_constraints(apps, schema_editor):
+    # Other backends fall back to the locked check in Appointment.save().
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    # Double bookings are left for a person to resolve; the migration never cancels them itself.
+    overlaps = find_overlaps(schema_editor.connection)
+    if overlaps:
+        details = "; ".join(f"same {column}: {pairs}" for column, pairs in overlaps.items())
+        raise RuntimeError(
+            "Cancel or reschedule the overlapping appointments (id pairs, first 20 per column) "
+            f"before applying this migration: {details}"
+        )
+    schema_editor.execute(CREATE_SQL)
+
+
+def drop_exclusion_constraints(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(DROP_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_cursor_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_exclusion_constraints, drop_exclusion_constraints),
+    ]
@@ -1,11 +1,15 @@
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import IntegrityError, connections, models, router, transaction
 from django.db.models import Q, F
 
 from common.models import TimeStampedModel
 from doctors.models import Doctor
 from patients.models import Patient
 
+# Exclusion constraints installed on PostgreSQL by migration 0003.
+DOCTOR_OVERLAP_CONSTRAINT = "appointment_doctor_no_overlap"
+PATIENT_OVERLAP_CONSTRAINT = "appointment_patient_no_overlap"
+
 
 class Appointment(TimeStampedModel):
     class Status(models.TextChoices):
@@ -30,24 +34,50 @@ class Appointment(TimeStampedModel):
             models.Index(fields=["doctor", "start_time"]),
             models.Index(fields=["patient", "start_time"]),
             models.Index(fields=["status"]),
+            models.Index(fields=["-start_time", "-id"], name="appointment_start_id_idx"),
         ]
 
     def clean(self):
         if self.end_time <= self.start_time:
             raise ValidationError("end_time must be greater than start_time")
-        overlap_qs = Appointment.objects.filter(
-            doctor=self.doctor,
-            start_time__lt=self.end_time,
-            end_time__gt=self.start_time,
+
+    def check_overlap(self, using="default"):
+        """Reject doctor or patient double-booking with a single query.
+
+        Only needed where the database cannot enforce the exclusion constraints
+        itself; callers must hold the write lock (SQLite runs in IMMEDIATE mode).
+        """
+        if self.status == self.Status.CANCELLED:
+            return
+        overlap_qs = (
+            Appointment.objects.using(using)
+            .exclude(status=self.Status.CANCELLED)
+            .filter(start_time__lt=self.end_time, end_time__gt=self.start_time)
+            .filter(Q(doctor_id=self.doctor_id) | Q(patient_id=self.patient_id))
         )
         if self.pk:
             overlap_qs = overlap_qs.exclude(pk=self.pk)
-        if overlap_qs.exists():
+        conflict = overlap_qs.values_list("doctor_id", flat=True).first()
+        if conflict is None:
+            return
+        if conflict == self.doctor_id:
             raise ValidationError("Doctor has overlapping appointment")
+        raise ValidationError("Patient has overlapping appointment")
 
     def save(self, *args, **kwargs):
         self.clean()
-        super().save(*args, **kwargs)
+        using = kwargs.get("using") or router.db_for_write(Appointment, instance=self)
+        try:
+            with transaction.atomic(using=using):
+                if connections[using].vendor != "postgresql":
+                    self.check_overlap(using)
+                super().save(*args, **kwargs)
+        except IntegrityError as exc:
+            if DOCTOR_OVERLAP_CONSTRAINT in str(exc):
+                raise ValidationError("Doctor has overlapping appointment") from exc
+            if PATIENT_OVERLAP_CONSTRAINT in str(exc):
+                raise ValidationError("Patient has overlapping appointment") from exc
+            raise
 
 
 APPOINTMENT_STATUS_CHOICES = Appointment.Status.choices
@@ -1,9 +1,29 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
+from rest_framework.settings import api_settings
+
+from common.serializers import TimedModelSerializer
 
 from .models import Appointment
 
 
-class AppointmentSerializer(serializers.ModelSerializer):
+class AppointmentSaveMixin:
+    """Surface the overlap errors raised atomically by Appointment.save() as 400s."""
+
+    def create(self, validated_data):
+        try:
+            return super().create(validated_data)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: exc.messages}) from exc
+
+    def update(self, instance, validated_data):
+        try:
+            return super().update(instance, validated_data)
+        except DjangoValidationError as exc:
+            raise serializers.ValidationError({api_settings.NON_FIELD_ERRORS_KEY: exc.messages}) from exc
+
+
+class AppointmentSerializer(AppointmentSaveMixin, TimedModelSerializer):
     doctor_name = serializers.CharField(source="doctor.user.full_name", read_only=True)
     patient_name = serializers.CharField(source="patient.user.full_name", read_only=True)
 
@@ -29,19 +49,12 @@ class AppointmentSerializer(serializers.ModelSerializer):
     def validate(self, attrs):
         start_time = attrs.get("start_time", getattr(self.instance, "start_time", None))
         end_time = attrs.get("end_time", getattr(self.instance, "end_time", None))
-        doctor = attrs.get("doctor", getattr(self.instance, "doctor", None))
         if start_time and end_time and end_time <= start_time:
             raise serializers.ValidationError({"end_time": "end_time must be greater than start_time"})
-        if doctor and start_time and end_time:
-            qs = Appointment.objects.filter(doctor=doctor, start_time__lt=end_time, end_time__gt=start_time)
-            if self.instance:
-                qs = qs.exclude(pk=self.instance.pk)
-            if qs.exists():
-                raise serializers.ValidationError("Doctor has overlapping appointment")
         return attrs
 
 
-class AppointmentStatusSerializer(serializers.ModelSerializer):
+class AppointmentStatusSerializer(AppointmentSaveMixin, TimedModelSerializer):
     class Meta:
         model = Appointment
         fields = ("status",)
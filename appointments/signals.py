@@ -1,11 +1,15 @@
-from django.core.cache import cache
+from django.db import transaction
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
+from common.cache import bump_version
+
 from .models import Appointment
 
 
 @receiver(post_save, sender=Appointment)
 @receiver(post_delete, sender=Appointment)
 def invalidate_dashboard_cache(*args, **kwargs):
-    cache.delete("dashboard_overview")
+    bump_version("dashboard_overview")
+    # Again after commit, in case another worker re-cached the old counts in between.
+    transaction.on_commit(lambda: bump_version("dashboard_overview"))
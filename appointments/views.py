@@ -2,24 +2,22 @@ from rest_framework import generics
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import IsAuthenticated
 
+from common.pagination import StartTimeCursorPagination
+from common.scoping import profile_ids, scope_by_role
+
 from .models import Appointment
 from .serializers import AppointmentSerializer, AppointmentStatusSerializer
 
 
 class AppointmentListCreateView(generics.ListCreateAPIView):
+    query_budget = {"GET": 3, "POST": 12}
     serializer_class = AppointmentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = StartTimeCursorPagination
 
     def get_queryset(self):
-        qs = Appointment.objects.select_related("doctor__user", "patient__user").all().order_by("-start_time")
-        user = self.request.user
-        if user.role == "ADMIN":
-            return qs
-        if user.role == "DOCTOR":
-            return qs.filter(doctor__user=user)
-        if user.role == "PATIENT":
-            return qs.filter(patient__user=user)
-        return qs.none()
+        qs = Appointment.objects.select_related("doctor__user", "patient__user").all().order_by("-start_time", "-id")
+        return scope_by_role(qs, self.request)
 
     def perform_create(self, serializer):
         user = self.request.user
@@ -27,10 +25,12 @@ class AppointmentListCreateView(generics.ListCreateAPIView):
             serializer.save()
             return
         if user.role == "PATIENT":
-            patient = getattr(user, "patient_profile", None)
-            if not patient:
+            _, patient_id = profile_ids(self.request)
+            if not patient_id:
                 raise PermissionDenied("Patient profile is required")
-            serializer.save(patient=patient)
+            # Patients always book for themselves, whatever the payload says.
+            serializer.validated_data.pop("patient", None)
+            serializer.save(patient_id=patient_id)
             return
         raise PermissionDenied("Only admin or patient can create appointments")
 
@@ -0,0 +1,199 @@
+"""Serializer and view micro-benchmarks over synthetic data, checked against benchmarks/results.json.
+
+    python benchmarks/run.py                       # 1k/10k/100k rows, compare with the results file
+    python benchmarks/run.py --sizes 1000,10000    # quicker
+    python benchmarks/run.py --update              # record this machine's numbers as the new baseline
+
+Each case serializes the first N rows of a list view's own queryset (as an admin sees it)
+through the view's serializer, or computes the uncached dashboard over the whole dataset.
+Per case it records the best wall time of --repeat runs, the peak allocation of one more
+run under tracemalloc, and the query count. A case fails when it is more than
+--max-slowdown percent slower (or allocates that much more) than the committed result, or
+runs more queries. Timings are machine-dependent: refresh the file with --update on the
+machine that runs the comparison.
+
+The data comes from `generate_dataset` into a SQLite file under the temp directory, which is
+kept and reused by later runs of the same size.
+"""
+
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+RESULTS_FILE = Path(__file__).resolve().parent / "results.json"
+DEFAULT_SIZES = "1000,10000,100000"
+
+# Share of generated appointments that end with a prescription and an invoice is about 0.56.
+APPOINTMENTS_PER_ROW = 2
+
+
+def setup_django(sizes: list[int]) -> Path:
+    database = Path(tempfile.gettempdir()) / f"hms-benchmarks-{max(sizes)}.sqlite3"
+    sys.path.insert(0, str(ROOT_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "config.dev")
+    os.environ["DATABASE_URL"] = f"sqlite:///{database}"
+    import django
+
+    django.setup()
+    return database
+
+
+def ensure_dataset(largest: int) -> None:
+    from django.core.management import call_command
+
+    from billing.models import Invoice
+    from prescriptions.models import Prescription
+
+    call_command("migrate", verbosity=0)
+    if min(Prescription.objects.count(), Invoice.objects.count()) >= largest:
+        return
+    appointments = largest * APPOINTMENTS_PER_ROW
+    doctors = max(20, math.ceil(appointments / 2000))
+    print(f"Generating {appointments} appointments (kept for later runs)...")
+    call_command(
+        "generate_dataset", doctors=doctors, patients=max(doctors, appointments // 10),
+        appointments=appointments, days=365, medicines=200, seed=1,
+    )
+
+
+def admin_request():
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    from accounts.models import User
+
+    admin = User.objects.filter(role=User.Role.ADMIN).first() or User.objects.create_user(
+        email="benchmarks@example.test", password=None, full_name="Benchmarks", role=User.Role.ADMIN
+    )
+    request = Request(APIRequestFactory().get("/"))
+    request.user = admin
+    return request
+
+
+def list_case(view_class, size):
+    """Serialize the first `size` rows of the view's queryset with the view's serializer."""
+    view = view_class()
+    view.request, view.format_kwarg, view.kwargs = admin_request(), None, {}
+
+    def run():
+        return view.get_serializer(view.get_queryset()[:size], many=True).data
+
+    return run
+
+
+def cases(sizes: list[int]):
+    from analytics.views import DashboardOverviewView
+    from appointments.views import AppointmentListCreateView
+    from billing.views import InvoiceListCreateView
+    from prescriptions.views import PrescriptionListCreateView
+
+    for size in sizes:
+        yield f"AppointmentSerializer[{size}]", list_case(AppointmentListCreateView, size)
+        yield f"PrescriptionSerializer[{size}]", list_case(PrescriptionListCreateView, size)
+        yield f"InvoiceSerializer[{size}]", list_case(InvoiceListCreateView, size)
+    # Aggregates the whole dataset, which is generated for the largest size.
+    yield f"DashboardOverviewView[{max(sizes)}]", DashboardOverviewView.compute_overview
+
+
+def measure(run, repeat: int) -> dict:
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    best = math.inf
+    for _ in range(repeat):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            run()
+            best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"wall_ms": round(best * 1000, 2), "peak_kib": round(peak / 1024, 1), "queries": len(queries)}
+
+
+def compare(current: dict, baseline: dict, max_slowdown: float, min_delta_ms: float) -> list[str]:
+    """Cases that got slower, allocate more or run more queries than in `baseline`."""
+    failures = []
+    allowed = 1 + max_slowdown / 100
+    for name, now in current.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if now["wall_ms"] > before["wall_ms"] * allowed and now["wall_ms"] - before["wall_ms"] >= min_delta_ms:
+            failures.append(f"{name}: {before['wall_ms']:.1f} -> {now['wall_ms']:.1f} ms")
+        if now["peak_kib"] > before["peak_kib"] * allowed:
+            failures.append(f"{name}: peak {before['peak_kib']:.0f} -> {now['peak_kib']:.0f} KiB")
+        if now["queries"] > before["queries"]:
+            failures.append(f"{name}: {before['queries']} -> {now['queries']} queries")
+    return failures
+
+
+def environment() -> dict:
+    import django
+    import rest_framework
+    from django.db import connection
+
+    return {
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "djangorestframework": rest_framework.VERSION,
+        "database": f"{connection.vendor} {connection.Database.sqlite_version}"
+        if connection.vendor == "sqlite" else connection.vendor,
+        "machine": platform.machine(),
+    }
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated row counts")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case; the best one counts")
+    parser.add_argument("--max-slowdown", type=float, default=25, help="Allowed growth in percent")
+    parser.add_argument("--min-delta-ms", type=float, default=2, help="Ignore slowdowns smaller than this")
+    parser.add_argument("--results", type=Path, default=RESULTS_FILE, help="Committed results to compare with")
+    parser.add_argument("--update", action="store_true", help="Write this run to --results instead of comparing")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    sizes = sorted({int(size) for size in args.sizes.split(",")})
+    setup_django(sizes)
+    ensure_dataset(max(sizes))
+
+    results = {}
+    print(f"{'case':<40} {'wall ms':>10} {'peak KiB':>10} {'queries':>8}")
+    for name, run in cases(sizes):
+        results[name] = measure(run, args.repeat)
+        row = results[name]
+        print(f"{name:<40} {row['wall_ms']:>10.1f} {row['peak_kib']:>10.0f} {row['queries']:>8}")
+
+    if args.update:
+        args.results.write_text(json.dumps({"environment": environment(), "cases": results}, indent=2) + "\n")
+        print(f"Results written to {args.results}")
+        return 0
+    if not args.results.exists():
+        print(f"No results at {args.results}; run with --update to record a baseline.")
+        return 0
+    failures = compare(results, json.loads(args.results.read_text())["cases"], args.max_slowdown, args.min_delta_ms)
+    for line in failures:
+        print(f"REGRESSION {line}")
+    if failures:
+        return 1
+    print(f"Within {args.max_slowdown:g}% of {args.results.name}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
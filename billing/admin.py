@@ -1,5 +1,6 @@
 from django.contrib import admin
 
-from .models import Invoice
+from .models import DailyRevenue, Invoice
 
 admin.site.register(Invoice)
+admin.site.register(DailyRevenue)
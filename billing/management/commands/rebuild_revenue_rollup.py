@@ -0,0 +1,19 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from billing.models import DailyRevenue
+
+
+class Command(BaseCommand):
+    help = "Recompute the DailyRevenue rollup from invoices for a date range (default: everything)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--from", dest="date_from", type=date.fromisoformat, help="First day, YYYY-MM-DD")
+        parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="Last day (inclusive), YYYY-MM-DD")
+
+    def handle(self, *args, date_from=None, date_to=None, **options):
+        if date_from and date_to and date_to < date_from:
+            raise CommandError("--to must not be before --from")
+        buckets = DailyRevenue.objects.rebuild(date_from, date_to)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {buckets} revenue buckets"))
@@ -0,0 +1,24 @@
+from decimal import Decimal, InvalidOperation
+
+from django.core.management.base import BaseCommand, CommandError
+
+from billing.models import Invoice
+from medicines.models import SystemSettings
+
+
+class Command(BaseCommand):
+    help = "Re-apply the global discount (or --discount) to every PENDING invoice with set-based UPDATEs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--discount", help="Discount percent to apply; defaults to the current system setting")
+        parser.add_argument("--chunk-size", type=int, default=5000, help="Invoice ids per UPDATE")
+
+    def handle(self, *args, discount=None, chunk_size, **options):
+        try:
+            percent = Decimal(discount) if discount is not None else SystemSettings.get_settings().discount_percent
+        except InvalidOperation:
+            raise CommandError("--discount must be a number")
+        if not 0 <= percent <= 100:
+            raise CommandError("--discount must be between 0 and 100")
+        changed = Invoice.objects.reprice_pending(percent, chunk_size=chunk_size)
+        self.stdout.write(self.style.SUCCESS(f"Repriced {changed} pending invoices at {percent}% discount"))
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_cursor_pagination_indexes'),
+        ('billing', '0002_remove_invoice_amount_remove_invoice_discount_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='invoice',
+            index=models.Index(fields=['-created_at', '-id'], name='invoice_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_revenue(apps, schema_editor):
+    Invoice = apps.get_model("billing", "Invoice")
+    DailyRevenue = apps.get_model("billing", "DailyRevenue")
+    rows = (
+        Invoice.objects.annotate(date=TruncDate("created_at"))
+        .values("date", "status", doctor_id=F("appointment__doctor_id"))
+        .annotate(invoice_count=Count("id"), total_amount=Sum("total_amount"))
+        .order_by()
+    )
+    DailyRevenue.objects.bulk_create((DailyRevenue(**row) for row in rows.iterator()), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('billing', '0003_cursor_pagination_indexes'),
+        ('doctors', '0002_workinghours'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRevenue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('PAID', 'Paid'), ('VOID', 'Void')], max_length=20)),
+                ('invoice_count', models.IntegerField(default=0)),
+                ('total_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_revenue', to='doctors.doctor')),
+            ],
+            options={
+                'ordering': ['date', 'doctor', 'status'],
+                'constraints': [models.UniqueConstraint(fields=('date', 'doctor', 'status'), name='daily_revenue_unique_bucket')],
+            },
+        ),
+        migrations.RunPython(backfill_daily_revenue, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,80 @@
-from django.db import models
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, F, Max, Min, Sum, Value
+from django.db.models.functions import Round, TruncDate
+from django.utils import timezone
 
 from appointments.models import Appointment
+from common.cache import bump_version
 from common.models import TimeStampedModel
+from doctors.models import Doctor
+
+
+def invalidate_revenue_caches():
+    """Bump the cached analytics built from invoices; bulk UPDATEs must call it themselves."""
+    def bump():
+        bump_version("dashboard_overview")
+        bump_version("revenue_series")
+
+    bump()
+    # Again after commit, in case another worker re-cached the old totals in between.
+    transaction.on_commit(bump)
+
+
+class InvoiceManager(models.Manager):
+    def reprice_pending(self, discount_percent, chunk_size=5000):
+        """Re-apply `discount_percent` to every PENDING invoice with set-based UPDATEs.
+
+        Walks the id range in chunks, one UPDATE and one short transaction per chunk, so no
+        model is loaded and no lock is held across the whole table. The totals use the same
+        formula as calculate_totals(); SQLite evaluates it in floating point, but its ROUND()
+        still rounds half-cents up as quantize() does, which the tests check. Returns the number
+        of invoices changed; the daily rollup for the affected days is rebuilt afterwards.
+        """
+        pending = self.filter(status=Invoice.Status.PENDING).exclude(discount_percent=discount_percent)
+        bounds = pending.aggregate(first=Min("id"), last=Max("id"), since=Min("created_at"), until=Max("created_at"))
+        if bounds["first"] is None:
+            return 0
+        percent = Value(Decimal(discount_percent), output_field=models.DecimalField(max_digits=5, decimal_places=2))
+        subtotal = F("consultation_fee") + F("medicine_total")
+        discount = Round(subtotal * percent / 100, 2)
+        changed = 0
+        for start in range(bounds["first"], bounds["last"] + 1, chunk_size):
+            with transaction.atomic():
+                changed += pending.filter(id__gte=start, id__lt=start + chunk_size).update(
+                    discount_percent=percent,
+                    discount_amount=discount,
+                    total_amount=subtotal + F("tax") - discount,
+                    updated_at=timezone.now(),
+                )
+        DailyRevenue.objects.rebuild(timezone.localdate(bounds["since"]), timezone.localdate(bounds["until"]))
+        invalidate_revenue_caches()
+        return changed
+
+    def pay(self, pk, patient_id, payment_method=""):
+        """Mark a patient's own PENDING invoice PAID; returns paid_at, or None when it did not apply.
+
+        The conditional UPDATE is the compare-and-set: status and ownership are checked in
+        its WHERE clause on the invoice row itself, so of two concurrent attempts exactly
+        one matches. The rollup is then moved from the PENDING to the PAID bucket.
+        """
+        paid_at = timezone.now()
+        own_appointments = Appointment.objects.filter(patient_id=patient_id).values("id")
+        with transaction.atomic():
+            paid = self.filter(pk=pk, status=Invoice.Status.PENDING, appointment_id__in=own_appointments).update(
+                status=Invoice.Status.PAID, paid_at=paid_at, payment_method=payment_method, updated_at=paid_at
+            )
+            if not paid:
+                return None
+            created_at, total, doctor_id = (
+                self.filter(pk=pk).values_list("created_at", "total_amount", "appointment__doctor_id").get()
+            )
+            day = timezone.localdate(created_at)
+            DailyRevenue.objects.apply_delta(day, doctor_id, Invoice.Status.PENDING, -1, -total)
+            DailyRevenue.objects.apply_delta(day, doctor_id, Invoice.Status.PAID, 1, total)
+        invalidate_revenue_caches()
+        return paid_at
 
 
 class Invoice(TimeStampedModel):
@@ -21,15 +94,113 @@ class Invoice(TimeStampedModel):
     payment_method = models.CharField(max_length=40, blank=True)
     paid_at = models.DateTimeField(null=True, blank=True)
 
+    objects = InvoiceManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="invoice_created_id_idx"),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the rollup bucket as loaded so save()/delete can move the totals.
+        if {"created_at", "status", "total_amount"}.issubset(instance.__dict__):
+            instance._rollup_state = (timezone.localdate(instance.created_at), instance.status, instance.total_amount)
+        return instance
+
     def calculate_totals(self):
         """Recalculate all totals from the prescription items."""
-        subtotal = self.consultation_fee + self.medicine_total
-        self.discount_amount = subtotal * self.discount_percent / 100
-        self.total_amount = subtotal + self.tax - self.discount_amount
+        subtotal = Decimal(self.consultation_fee) + Decimal(self.medicine_total)
+        # Rounded to what the columns store, half-up like SQL ROUND() in reprice_pending().
+        self.discount_amount = (subtotal * Decimal(self.discount_percent) / 100).quantize(
+            Decimal("0.01"), rounding=ROUND_HALF_UP
+        )
+        self.total_amount = subtotal + Decimal(self.tax) - self.discount_amount
 
     def save(self, *args, **kwargs):
         self.calculate_totals()
-        super().save(*args, **kwargs)
+        with transaction.atomic(using=kwargs.get("using")):
+            old_state = self.loaded_rollup_state()
+            super().save(*args, **kwargs)
+            new_state = (timezone.localdate(self.created_at), self.status, self.total_amount)
+            if old_state != new_state:
+                doctor_id = self.rollup_doctor_id()
+                if old_state:
+                    DailyRevenue.objects.apply_delta(old_state[0], doctor_id, old_state[1], -1, -old_state[2])
+                DailyRevenue.objects.apply_delta(new_state[0], doctor_id, new_state[1], 1, new_state[2])
+            self._rollup_state = new_state
+
+    def loaded_rollup_state(self):
+        if self._state.adding:
+            return None
+        if not hasattr(self, "_rollup_state"):
+            row = Invoice.objects.filter(pk=self.pk).values_list("created_at", "status", "total_amount").first()
+            self._rollup_state = row and (timezone.localdate(row[0]), row[1], row[2])
+        return self._rollup_state
+
+    def rollup_doctor_id(self):
+        if Invoice.appointment.is_cached(self):
+            return self.appointment.doctor_id
+        return Appointment.objects.filter(pk=self.appointment_id).values_list("doctor_id", flat=True).first()
+
+
+class DailyRevenueManager(models.Manager):
+    def apply_delta(self, date, doctor_id, status, count, amount):
+        """Move one bucket's totals with a single UPDATE, creating it when an invoice first lands in it.
+
+        Removals never create buckets: the bucket may already be going away with its doctor.
+        """
+        bucket = self.filter(date=date, doctor_id=doctor_id, status=status)
+        delta = {"invoice_count": F("invoice_count") + count, "total_amount": F("total_amount") + amount}
+        if bucket.update(**delta) or count < 0:
+            return
+        try:
+            with transaction.atomic():
+                self.create(date=date, doctor_id=doctor_id, status=status, invoice_count=count, total_amount=amount)
+        except IntegrityError:
+            # A concurrent transaction created the bucket first.
+            bucket.update(**delta)
+
+    def rebuild(self, date_from=None, date_to=None):
+        """Recompute the buckets for [date_from, date_to] from invoices with one aggregate query."""
+        buckets = self.all()
+        invoices = Invoice.objects.annotate(date=TruncDate("created_at"))
+        if date_from:
+            buckets = buckets.filter(date__gte=date_from)
+            invoices = invoices.filter(date__gte=date_from)
+        if date_to:
+            buckets = buckets.filter(date__lte=date_to)
+            invoices = invoices.filter(date__lte=date_to)
+        rows = (
+            invoices.values("date", "status", doctor_id=F("appointment__doctor_id"))
+            .annotate(invoice_count=Count("id"), total_amount=Sum("total_amount"))
+            .order_by()
+        )
+        with transaction.atomic():
+            buckets.delete()
+            created = self.bulk_create((DailyRevenue(**row) for row in rows.iterator()), batch_size=1000)
+        return len(created)
+
+
+class DailyRevenue(models.Model):
+    """Invoice count and total per (day, doctor, status), kept in step with Invoice writes."""
+    date = models.DateField()
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name="daily_revenue")
+    status = models.CharField(max_length=20, choices=Invoice.Status.choices)
+    invoice_count = models.IntegerField(default=0)
+    total_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    objects = DailyRevenueManager()
+
+    class Meta:
+        ordering = ["date", "doctor", "status"]
+        constraints = [
+            models.UniqueConstraint(fields=["date", "doctor", "status"], name="daily_revenue_unique_bucket"),
+        ]
+
+    def __str__(self):
+        return f"{self.date} doctor={self.doctor_id} {self.status}: {self.total_amount}"
 
 
 INVOICE_STATUS_CHOICES = Invoice.Status.choices
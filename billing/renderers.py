@@ -0,0 +1,44 @@
+import json
+
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BaseRenderer
+
+
+class ExportRenderer(BaseRenderer):
+    """Negotiates ?format= for streamed exports.
+
+    Successful exports bypass rendering with a StreamingHttpResponse; only error
+    payloads (permission or validation failures) are rendered here, as JSON.
+    """
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, default=str).encode(self.charset)
+
+
+class CSVRenderer(ExportRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+
+class NDJSONRenderer(ExportRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+
+class ExportContentNegotiation(DefaultContentNegotiation):
+    """Lets ?format= alone choose the export; an Accept header naming neither format is ignored.
+
+    HTTP clients commonly send `Accept: application/json` by default. Answering that with 406
+    would turn a plain download into an error, so the export falls back to the ?format= renderer,
+    else CSV. An unknown ?format= is still a 404.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        try:
+            return super().select_renderer(request, renderers, format_suffix)
+        except NotAcceptable:
+            format = format_suffix or request.query_params.get(self.settings.URL_FORMAT_OVERRIDE)
+            renderer = self.filter_renderers(renderers, format)[0] if format else renderers[0]
+            return renderer, renderer.media_type
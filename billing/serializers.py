@@ -1,9 +1,11 @@
 from rest_framework import serializers
 
+from common.serializers import TimedModelSerializer, TimedSerializer
+
 from .models import Invoice
 
 
-class InvoiceSerializer(serializers.ModelSerializer):
+class InvoiceSerializer(TimedModelSerializer):
     class Meta:
         model = Invoice
         fields = (
@@ -20,7 +22,24 @@ class InvoiceSerializer(serializers.ModelSerializer):
         )
 
 
-class InvoiceStatusSerializer(serializers.ModelSerializer):
+class InvoiceStatusSerializer(TimedModelSerializer):
     class Meta:
         model = Invoice
         fields = ("status", "payment_method", "paid_at")
+
+
+class InvoiceExportQuerySerializer(TimedSerializer):
+    # "from" is a keyword, so the field is renamed in get_fields() below.
+    from_ = serializers.DateField(required=False)
+    to = serializers.DateField(required=False, help_text="Inclusive")
+    status = serializers.ChoiceField(choices=Invoice.Status.choices, required=False)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fields["from"] = fields.pop("from_")
+        return fields
+
+    def validate(self, attrs):
+        if attrs.get("from") and attrs.get("to") and attrs["to"] < attrs["from"]:
+            raise serializers.ValidationError({"to": "to must not be before from"})
+        return attrs
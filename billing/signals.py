@@ -1,11 +1,19 @@
-from django.core.cache import cache
 from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from .models import Invoice
+from .models import DailyRevenue, Invoice, invalidate_revenue_caches
 
 
 @receiver(post_save, sender=Invoice)
 @receiver(post_delete, sender=Invoice)
 def invalidate_dashboard_cache(*args, **kwargs):
-    cache.delete("dashboard_overview")
+    invalidate_revenue_caches()
+
+
+@receiver(post_delete, sender=Invoice)
+def remove_from_revenue_rollup(sender, instance, **kwargs):
+    # Runs inside the delete transaction, including cascades from Appointment.
+    state = getattr(instance, "_rollup_state", None)
+    doctor_id = state and instance.rollup_doctor_id()
+    if doctor_id:
+        DailyRevenue.objects.apply_delta(state[0], doctor_id, state[1], -1, -state[2])
@@ -1,8 +1,9 @@
 from django.urls import path
 
-from .views import InvoiceListCreateView, InvoiceStatusUpdateView
+from .views import InvoiceExportView, InvoiceListCreateView, InvoiceStatusUpdateView
 
 urlpatterns = [
     path("invoices/", InvoiceListCreateView.as_view(), name="invoice-list-create"),
+    path("invoices/export/", InvoiceExportView.as_view(), name="invoice-export"),
     path("invoices/<int:pk>/status/", InvoiceStatusUpdateView.as_view(), name="invoice-status-update"),
 ]
@@ -1,26 +1,39 @@
+import csv
+import json
+from datetime import datetime, time, timedelta
+
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from rest_framework import generics
-from rest_framework.exceptions import PermissionDenied
+from drf_spectacular.utils import OpenApiParameter, extend_schema
+from rest_framework import generics, status
+from rest_framework.exceptions import NotFound, PermissionDenied
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from common.scoping import profile_ids, scope_by_role
 
 from .models import Invoice
-from .serializers import InvoiceSerializer, InvoiceStatusSerializer
+from .renderers import CSVRenderer, ExportContentNegotiation, NDJSONRenderer
+from .serializers import InvoiceExportQuerySerializer, InvoiceSerializer, InvoiceStatusSerializer
+
+
+def scoped_invoices(request):
+    """Invoices visible to the caller: all for admins, their own for doctors and patients."""
+    return scope_by_role(
+        Invoice.objects.all(), request, doctor_field="appointment__doctor_id", patient_field="appointment__patient_id"
+    )
 
 
 class InvoiceListCreateView(generics.ListCreateAPIView):
+    query_budget = {"GET": 3, "POST": 12}
     serializer_class = InvoiceSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        qs = Invoice.objects.select_related("appointment__doctor__user", "appointment__patient__user").all().order_by("-created_at")
-        user = self.request.user
-        if user.role == "ADMIN":
-            return qs
-        if user.role == "DOCTOR":
-            return qs.filter(appointment__doctor__user=user)
-        if user.role == "PATIENT":
-            return qs.filter(appointment__patient__user=user)
-        return qs.none()
+        return scoped_invoices(self.request).select_related(
+            "appointment__doctor__user", "appointment__patient__user"
+        ).order_by("-created_at", "-id")
 
     def perform_create(self, serializer):
         if self.request.user.role != "ADMIN":
@@ -28,7 +41,86 @@ class InvoiceListCreateView(generics.ListCreateAPIView):
         serializer.save()
 
 
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+class InvoiceExportView(APIView):
+    """Stream invoices as CSV or NDJSON with constant memory per worker.
+
+    ?format= picks the format (CSV by default); an Accept header asking for anything else,
+    such as application/json, gets that format rather than 406 (see ExportContentNegotiation).
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [CSVRenderer, NDJSONRenderer]
+    content_negotiation_class = ExportContentNegotiation
+    chunk_size = 2000
+    columns = {
+        "id": "id",
+        "created_at": "created_at",
+        "appointment": "appointment_id",
+        "doctor_name": "appointment__doctor__user__full_name",
+        "patient_name": "appointment__patient__user__full_name",
+        "consultation_fee": "consultation_fee",
+        "medicine_total": "medicine_total",
+        "tax": "tax",
+        "discount_percent": "discount_percent",
+        "discount_amount": "discount_amount",
+        "total_amount": "total_amount",
+        "status": "status",
+        "payment_method": "payment_method",
+        "paid_at": "paid_at",
+    }
+
+    @extend_schema(
+        parameters=[
+            InvoiceExportQuerySerializer,
+            OpenApiParameter("format", enum=["csv", "ndjson"], default="csv"),
+        ],
+        responses={(200, "text/csv"): str, (200, "application/x-ndjson"): str},
+    )
+    def get(self, request):
+        params = InvoiceExportQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        rows = self.get_rows(params.validated_data)
+        if request.accepted_renderer.format == "ndjson":
+            response = StreamingHttpResponse(self.stream_ndjson(rows), content_type="application/x-ndjson")
+        else:
+            response = StreamingHttpResponse(self.stream_csv(rows), content_type="text/csv")
+        filename = f"invoices-{timezone.localdate().isoformat()}.{request.accepted_renderer.format}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+    def get_rows(self, filters):
+        qs = scoped_invoices(self.request)
+        tz = timezone.get_current_timezone()
+        if filters.get("from"):
+            qs = qs.filter(created_at__gte=datetime.combine(filters["from"], time.min, tzinfo=tz))
+        if filters.get("to"):
+            qs = qs.filter(created_at__lt=datetime.combine(filters["to"] + timedelta(days=1), time.min, tzinfo=tz))
+        if filters.get("status"):
+            qs = qs.filter(status=filters["status"])
+        # values_list + iterator() streams tuples through a server-side cursor (PostgreSQL)
+        # without building Invoice instances or serializer dicts.
+        return qs.order_by("id").values_list(*self.columns.values()).iterator(chunk_size=self.chunk_size)
+
+    def stream_csv(self, rows):
+        writer = csv.writer(_Echo())
+        yield writer.writerow(self.columns.keys())
+        for row in rows:
+            yield writer.writerow(row)
+
+    def stream_ndjson(self, rows):
+        names = list(self.columns)
+        for row in rows:
+            yield json.dumps(dict(zip(names, row)), default=str) + "\n"
+
+
 class InvoiceStatusUpdateView(generics.UpdateAPIView):
+    query_budget = {"PATCH": 12}
     serializer_class = InvoiceStatusSerializer
     queryset = Invoice.objects.all()
     permission_classes = [IsAuthenticated]
@@ -36,22 +128,30 @@ class InvoiceStatusUpdateView(generics.UpdateAPIView):
     def patch(self, request, *args, **kwargs):
         return self.partial_update(request, *args, **kwargs)
 
-    def perform_update(self, serializer):
-        user = self.request.user
-        invoice = self.get_object()
+    def update(self, request, *args, **kwargs):
+        if request.user.role == "PATIENT":
+            # Patient can only pay their own PENDING invoices
+            return self.pay(request, kwargs["pk"])
+        if request.user.role != "ADMIN":
+            raise PermissionDenied("Not authorized to update invoice status")
+        # Admin can change any status
+        return super().update(request, *args, **kwargs)
 
-        if user.role == "ADMIN":
-            # Admin can change any status
-            serializer.save()
-            return
+    def pay(self, request, pk):
+        serializer = self.get_serializer(data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        payment_method = serializer.validated_data.get("payment_method", "")
+        _, patient_id = profile_ids(request)
+        paid_at = Invoice.objects.pay(pk, patient_id, payment_method)
+        if paid_at:
+            return Response(self.get_serializer(
+                {"status": Invoice.Status.PAID, "payment_method": payment_method, "paid_at": paid_at}
+            ).data)
 
-        if user.role == "PATIENT":
-            # Patient can only pay their own PENDING invoices
-            if invoice.appointment.patient.user_id != user.id:
-                raise PermissionDenied("You can only pay your own invoices")
-            if invoice.status != "PENDING":
-                raise PermissionDenied("This invoice is already " + invoice.status.lower())
-            serializer.save(status="PAID", paid_at=timezone.now())
-            return
-
-        raise PermissionDenied("Not authorized to update invoice status")
+        # Only a failed attempt pays for finding out why.
+        row = Invoice.objects.filter(pk=pk).values_list("status", "appointment__patient_id").first()
+        if row is None:
+            raise NotFound()
+        if row[1] != patient_id:
+            raise PermissionDenied("You can only pay your own invoices")
+        return Response({"detail": f"This invoice is already {row[0].lower()}"}, status=status.HTTP_409_CONFLICT)
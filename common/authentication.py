@@ -0,0 +1,128 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .cache import bump_version, get_version
+
+User = get_user_model()
+
+# Everything views read from request.user; the password hash is never cached.
+USER_FIELDS = (
+    "id", "email", "full_name", "phone", "role", "is_active", "is_staff", "is_superuser",
+    "last_login", "created_at", "updated_at",
+)
+
+
+class _LRU:
+    """Tiny thread-safe per-process LRU of {key: (version, payload)}."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, version):
+        with self.lock:
+            entry = self.data.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self.data.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, version, payload):
+        with self.lock:
+            self.data[key] = (version, payload)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+_local_users = _LRU(getattr(settings, "AUTH_USER_CACHE_SIZE", 1024))
+
+
+def _version_name(user_id):
+    return f"auth_user:{user_id}"
+
+
+def invalidate_cached_user(user_id):
+    """Drop a user's cached identity in every worker (status change, profile save, delete)."""
+    bump_version(_version_name(user_id))
+    # Again after commit, in case a concurrent request re-cached the old row in between.
+    transaction.on_commit(lambda: bump_version(_version_name(user_id)))
+
+
+def load_user_payload(user_id):
+    """The user's fields plus doctor/patient profile ids, in one LEFT JOIN query."""
+    return (
+        User.objects.filter(pk=user_id)
+        .values(*USER_FIELDS, doctor_profile_id=F("doctor_profile__id"), patient_profile_id=F("patient_profile__id"))
+        .first()
+    )
+
+
+def build_user(payload):
+    """A User instance for `payload` with the password deferred, so save() cannot blank it."""
+    # from_db() expects values in model field order, not in the order names are given.
+    names = [field.attname for field in User._meta.concrete_fields if field.attname in payload]
+    user = User.from_db("default", names, [payload[name] for name in names])
+    user.doctor_profile_id = payload["doctor_profile_id"]
+    user.patient_profile_id = payload["patient_profile_id"]
+    return user
+
+
+def get_profile_ids(user):
+    """(doctor_profile_id, patient_profile_id) for any authenticated user."""
+    if not hasattr(user, "doctor_profile_id"):
+        payload = load_user_payload(user.pk) or {"doctor_profile_id": None, "patient_profile_id": None}
+        user.doctor_profile_id = payload["doctor_profile_id"]
+        user.patient_profile_id = payload["patient_profile_id"]
+    return user.doctor_profile_id, user.patient_profile_id
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that serves the user and profile ids from a two-level cache.
+
+    A per-process LRU sits in front of the shared Django cache; both are keyed by a
+    per-user version stamp, so invalidate_cached_user() reaches every worker on its
+    next request. Entries live no longer than the token that loaded them.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # Revocation compares the password hash, which is deliberately not cached.
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        version = get_version(_version_name(user_id))
+        payload = _local_users.get(user_id, version)
+        if payload is None:
+            shared_key = f"auth_user:{user_id}:v{version}"
+            payload = cache.get(shared_key)
+            if payload is None:
+                payload = load_user_payload(user_id)
+                if payload is None:
+                    raise AuthenticationFailed(_("User not found"), code="user_not_found")
+                ttl = max(int(validated_token["exp"] - time.time()), 1)
+                cache.set(shared_key, payload, ttl)
+            _local_users.set(user_id, version, payload)
+
+        if not payload["is_active"]:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return build_user(payload)
@@ -0,0 +1,33 @@
+import time
+
+from django.core.cache import cache
+
+
+def _version_key(name):
+    return f"version:{name}"
+
+
+def get_version(name):
+    """Current version stamp of a cached dataset, shared by every worker through the cache."""
+    key = _version_key(name)
+    version = cache.get(key)
+    if version is None:
+        # Seed with a timestamp so an evicted counter never reuses an old version.
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(name):
+    """Invalidate everything cached under `name` by moving its version forward."""
+    key = _version_key(name)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def versioned_key(name, *parts):
+    return ":".join([name, f"v{get_version(name)}", *map(str, parts)])
@@ -0,0 +1,35 @@
+"""Cache backends that count hits and misses for /metrics; configured in CACHES["default"]."""
+
+from django.core.cache.backends import locmem
+
+from . import metrics
+
+_MISSING = object()
+
+
+class CacheMetricsMixin:
+    def get(self, key, default=None, version=None, **kwargs):
+        value = super().get(key, _MISSING, version, **kwargs)
+        if value is _MISSING:
+            metrics.record_cache_gets(0, 1)
+            return default
+        metrics.record_cache_gets(1, 0)
+        return value
+
+
+class LocMemCache(CacheMetricsMixin, locmem.LocMemCache):
+    # BaseCache.get_many goes through get(), so it is counted there.
+    pass
+
+
+try:
+    from django_redis.cache import RedisCache as _RedisCache
+except ImportError:  # only needed when REDIS_URL is set
+    pass
+else:
+    class RedisCache(CacheMetricsMixin, _RedisCache):
+        def get_many(self, keys, version=None, **kwargs):
+            keys = list(keys)
+            found = super().get_many(keys, version, **kwargs)
+            metrics.record_cache_gets(len(found), len(keys) - len(found))
+            return found
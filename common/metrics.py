@@ -0,0 +1,54 @@
+"""Prometheus metrics, aggregated across gunicorn workers when PROMETHEUS_MULTIPROC_DIR is set.
+
+In multiprocess mode every worker writes its samples to mmap'd files in that directory
+(lock-free appends, no IPC), and /metrics merges them at scrape time. gunicorn.conf.py
+sets the directory up before the workers fork and marks dead workers' gauges.
+"""
+
+import os
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import REGISTRY, multiprocess
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Request latency by URL name", ["view", "method", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Response body size by URL name", ["view", "method"], buckets=SIZE_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "Database queries per request by URL name", ["view", "method"],
+    buckets=QUERY_BUCKETS,
+)
+CACHE_GETS = Counter("django_cache_gets", "Lookups against CACHES['default'], by result", ["result"])
+IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests being handled, per worker process", multiprocess_mode="liveall",
+)
+
+
+def view_name(request):
+    # Unresolved paths share one label so scanners cannot blow up the series count.
+    match = getattr(request, "resolver_match", None)
+    return match.view_name if match and match.view_name else "<unmatched>"
+
+
+def record_cache_gets(hits, misses):
+    if hits:
+        CACHE_GETS.labels("hit").inc(hits)
+    if misses:
+        CACHE_GETS.labels("miss").inc(misses)
+
+
+def render():
+    """(body, content type) of the current samples, merged across workers in multiprocess mode."""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
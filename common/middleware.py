@@ -0,0 +1,294 @@
+import hashlib
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from wsgiref.util import is_hop_by_hop
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse, JsonResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+from . import metrics, profiling
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyKeyMiddleware:
+    """Replay the first response to a mutating API request that carries an `Idempotency-Key`.
+
+    The key is scoped to the caller (the verified JWT user id, else the raw Authorization
+    header), method and path, and bound to a fingerprint of the body: reusing a key for a
+    different request is rejected with 422. Multipart bodies are not fingerprinted, so
+    they are not buffered in memory. Responses below 500 are kept for
+    IDEMPOTENCY_TTL_SECONDS and replayed, with their end-to-end headers, without reaching
+    the view or the database. A duplicate that arrives while the first is still running
+    waits on a cache lock for up to IDEMPOTENCY_WAIT_SECONDS, then gets 409 with Retry-After.
+    """
+
+    header = "Idempotency-Key"
+    methods = {"POST", "PUT", "PATCH", "DELETE"}
+    # Describe the original run rather than the response; the replay sets its own.
+    unreplayed_headers = {"server-timing", "content-length"}
+    poll_interval = 0.05
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.jwt = JWTAuthentication()
+
+    def __call__(self, request):
+        key = request.headers.get(self.header)
+        if not key or request.method not in self.methods or not request.path.startswith("/api/"):
+            return self.get_response(request)
+        if len(key) > 255:
+            return JsonResponse({"detail": f"{self.header} must be at most 255 characters"}, status=400)
+
+        scope = hashlib.sha256(
+            "\n".join([self.caller(request), request.method, request.path, key]).encode()
+        ).hexdigest()
+        cache_key, lock_key = f"idempotency:{scope}", f"idempotency:{scope}:lock"
+        fingerprint = self.fingerprint(request)
+
+        stored = cache.get(cache_key)
+        if stored is None:
+            if cache.add(lock_key, fingerprint, settings.IDEMPOTENCY_LOCK_SECONDS):
+                # The first request may have stored its response and released the lock
+                # between our get() and add(); holding the lock, look once more.
+                stored = cache.get(cache_key)
+                if stored is not None:
+                    cache.delete(lock_key)
+            else:
+                stored = self.wait_for(cache_key)
+                if stored is None:
+                    response = JsonResponse(
+                        {"detail": "A request with this idempotency key is in progress"}, status=409
+                    )
+                    response["Retry-After"] = "1"
+                    return response
+        if stored is not None:
+            return self.replay(stored, fingerprint)
+
+        try:
+            response = self.get_response(request)
+            if response.status_code < 500 and not response.streaming:
+                cache.set(cache_key, {
+                    "fingerprint": fingerprint,
+                    "status": response.status_code,
+                    "content": response.content,
+                    "headers": {
+                        name: value for name, value in response.items()
+                        if not is_hop_by_hop(name) and name.lower() not in self.unreplayed_headers
+                    },
+                }, settings.IDEMPOTENCY_TTL_SECONDS)
+        finally:
+            cache.delete(lock_key)
+        return response
+
+    def fingerprint(self, request):
+        # Multipart uploads are streamed to the view (MedicineImportView); reading the body here
+        # would buffer the whole file and trip DATA_UPLOAD_MAX_MEMORY_SIZE, so only the key binds them.
+        if request.content_type == "multipart/form-data":
+            return "multipart"
+        return hashlib.sha256(request.body).hexdigest()
+
+    def caller(self, request):
+        header = self.jwt.get_header(request)
+        try:
+            raw = header and self.jwt.get_raw_token(header)
+            if raw:
+                # Signature and expiry only; no database access.
+                return f"user:{self.jwt.get_validated_token(raw)[api_settings.USER_ID_CLAIM]}"
+        except (AuthenticationFailed, KeyError):
+            pass  # the view will reject the token; scope by the raw header meanwhile
+        return "auth:" + hashlib.sha256(header or b"").hexdigest()
+
+    def wait_for(self, cache_key):
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(self.poll_interval)
+            stored = cache.get(cache_key)
+            if stored is not None:
+                return stored
+        return None
+
+    def replay(self, stored, fingerprint):
+        if stored["fingerprint"] != fingerprint:
+            return JsonResponse(
+                {"detail": "This idempotency key was already used for a different request"}, status=422
+            )
+        response = HttpResponse(stored["content"], status=stored["status"], headers=stored["headers"])
+        response["Idempotent-Replayed"] = "true"
+        return response
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryStats:
+    """execute_wrapper that counts queries, sums their time and fingerprints them for N+1 detection."""
+
+    # Placeholder lists of any length, e.g. IN (%s, %s, %s), collapse to one fingerprint.
+    placeholder_lists = re.compile(r"\((?:%s|\?)(?:, (?:%s|\?))*\)")
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.fingerprints = Counter()
+        # Filled in by common.serializers while a top-level serializer builds its output.
+        self.serialize_duration = 0.0
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            if not sql.startswith(("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT")):
+                self.fingerprints[self.placeholder_lists.sub("(...)", sql)] += 1
+
+    def repeated(self):
+        """(fingerprint, count) of statements run more than once, most repeated first."""
+        return [(sql, count) for sql, count in self.fingerprints.most_common() if count > 1]
+
+
+class QueryInstrumentationMiddleware:
+    """Report query count, DB time, repeated statements, serializer and render time in `Server-Timing`.
+
+    `serialize` is the time the repo's serializers (common.serializers) spend building output,
+    including the queries that triggers; `render` is the JSON encoding of the response after it.
+
+    A view may declare `query_budget`, either an int or a {method: int} dict. Going over it
+    logs a warning naming the most repeated statement, or raises QueryBudgetExceeded when
+    QUERY_BUDGET_RAISE is set (as the test suite does).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        request._query_stats = stats
+        request._query_budget = None
+        request._render_duration = 0.0
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        repeated = stats.repeated()
+        response["Server-Timing"] = ", ".join([
+            f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"',
+            f'db-repeats;desc="{len(repeated)} repeated statements"',
+            f"serialize;dur={stats.serialize_duration * 1000:.1f}",
+            f"render;dur={request._render_duration * 1000:.1f}",
+            f"app;dur={elapsed * 1000:.1f}",
+        ])
+        self.check_budget(request, stats, repeated)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "cls", None) or getattr(view_func, "view_class", None)
+        budget = getattr(view_class, "query_budget", None)
+        if isinstance(budget, dict):
+            budget = budget.get(request.method)
+        request._query_budget = budget
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered right after this hook; time the render itself.
+        render = response.render
+
+        def timed_render():
+            started = time.perf_counter()
+            try:
+                return render()
+            finally:
+                request._render_duration += time.perf_counter() - started
+
+        response.render = timed_render
+        return response
+
+    def check_budget(self, request, stats, repeated):
+        budget = request._query_budget
+        if budget is None or stats.count <= budget:
+            return
+        message = f"{request.method} {request.path} ran {stats.count} queries (budget {budget})"
+        if repeated:
+            message += f"; most repeated x{repeated[0][1]}: {repeated[0][0][:200]}"
+        if settings.QUERY_BUDGET_RAISE:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class ProfilingMiddleware:
+    """Run an API request under cProfile when its caller sends the `X-Profile` token issued to
+    them (see /api/v1/_debug/profiles/token/) or it is picked by PROFILE_SAMPLE_RATE.
+
+    The top PROFILE_TOP_N functions by cumulative time, self time per component (db, orm,
+    serializers, render, framework, app) and the request's query stats are stored in the
+    profile ring buffer; the response names the capture in `X-Profile-Id`.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.path.startswith("/api/") or request.path.startswith("/api/v1/_debug/"):
+            return self.get_response(request)
+        trigger = profiling.trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        response, profiler = profiling.profile(self.get_response, request)
+        elapsed = time.perf_counter() - started
+        if profiler is None:
+            return response
+
+        functions, breakdown = profiling.summarize(profiler, settings.PROFILE_TOP_N)
+        stats = getattr(request, "_query_stats", None)
+        user = getattr(request, "user", None)
+        response["X-Profile-Id"] = profiling.store({
+            "method": request.method,
+            "path": request.get_full_path(),
+            "status": response.status_code,
+            "user": user.pk if user is not None and user.is_authenticated else None,
+            "trigger": trigger,
+            "duration_ms": round(elapsed * 1000, 3),
+            "queries": stats.count if stats else None,
+            "db_ms": round(stats.duration * 1000, 3) if stats else None,
+            "breakdown": breakdown,
+            "functions": functions,
+        })
+        return response
+
+
+class MetricsMiddleware:
+    """Feed the Prometheus latency, response size, query count and in-flight metrics (common.metrics)."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with metrics.IN_FLIGHT.track_inprogress():
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+
+        view, method = metrics.view_name(request), request.method
+        metrics.REQUEST_LATENCY.labels(view, method, response.status_code).observe(elapsed)
+        if not response.streaming:
+            metrics.RESPONSE_SIZE.labels(view, method).observe(len(response.content))
+        stats = getattr(request, "_query_stats", None)
+        if stats is not None:
+            metrics.REQUEST_QUERIES.labels(view, method).observe(stats.count)
+        return response
@@ -0,0 +1,20 @@
+from rest_framework.pagination import CursorPagination
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """Keyset pagination on (-created_at, -id); the default for list endpoints."""
+    ordering = ("-created_at", "-id")
+    page_size_query_param = "page_size"
+    max_page_size = 500
+
+
+class StartTimeCursorPagination(CreatedAtCursorPagination):
+    ordering = ("-start_time", "-id")
+
+
+class NameCursorPagination(CreatedAtCursorPagination):
+    ordering = ("name", "id")
+
+
+class EffectiveFromCursorPagination(CreatedAtCursorPagination):
+    ordering = ("-effective_from", "-id")
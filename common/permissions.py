@@ -1,3 +1,7 @@
+import hmac
+import ipaddress
+
+from django.conf import settings
 from rest_framework.permissions import BasePermission
 
 
@@ -24,3 +28,25 @@ class IsOwnerOrAdmin(BasePermission):
             return True
         owner = getattr(obj, self.user_attr, None)
         return owner == request.user
+
+
+class IsAdminOrInternalNetwork(BasePermission):
+    """Admins anywhere, a scraper sending `Authorization: Metrics <METRICS_SCRAPE_TOKEN>`, or
+    unauthenticated callers from METRICS_ALLOWED_NETWORKS.
+
+    The network check reads REMOTE_ADDR, so behind a reverse proxy it sees the proxy's address:
+    only list networks there that the proxy itself does not connect from.
+    """
+
+    def has_permission(self, request, view):
+        if IsAdminRole().has_permission(request, view):
+            return True
+        token = settings.METRICS_SCRAPE_TOKEN
+        scheme, _, credentials = request.META.get("HTTP_AUTHORIZATION", "").partition(" ")
+        if token and scheme == "Metrics" and hmac.compare_digest(credentials.encode(), token.encode()):
+            return True
+        try:
+            address = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+        except ValueError:
+            return False
+        return any(address in ipaddress.ip_network(network) for network in settings.METRICS_ALLOWED_NETWORKS)
@@ -0,0 +1,135 @@
+"""On-demand cProfile capture of API requests, kept in a bounded ring buffer in the shared cache."""
+
+import cProfile
+import pstats
+import random
+import sys
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+HEADER = "X-Profile"
+_SALT = "common.profiling"
+_SEQUENCE_KEY = "profiles:seq"
+
+# Where self time is spent, by source path (or C type, for builtins); the first match wins,
+# the rest is "app".
+COMPONENTS = (
+    ("db", ("/django/db/backends/", "sqlite3.", "psycopg")),
+    ("orm", ("/django/db/",)),
+    ("serializers", ("/rest_framework/serializers.py", "/rest_framework/fields.py", "/rest_framework/relations.py")),
+    ("render", ("/rest_framework/renderers.py", "/json/", "_json.")),
+    ("framework", ("/django/", "/rest_framework/", "/rest_framework_simplejwt/")),
+)
+
+
+def issue_token(user):
+    """Signed value for the X-Profile header; valid for PROFILE_TOKEN_MAX_AGE seconds, for `user` only."""
+    return signing.TimestampSigner(salt=_SALT).sign(str(user.pk))
+
+
+def caller_id(request):
+    """User id of the request's access token, checking signature and expiry only (no database)."""
+    jwt = JWTAuthentication()
+    header = jwt.get_header(request)
+    try:
+        raw = header and jwt.get_raw_token(header)
+        return raw and str(jwt.get_validated_token(raw)[api_settings.USER_ID_CLAIM])
+    except (AuthenticationFailed, KeyError):
+        return None
+
+
+def trigger(request):
+    """Why this request should be profiled ("header" or "sample"), or None."""
+    token = request.headers.get(HEADER)
+    if token:
+        try:
+            owner = signing.TimestampSigner(salt=_SALT).unsign(token, max_age=settings.PROFILE_TOKEN_MAX_AGE)
+        except signing.BadSignature:
+            return None
+        # Only the admin it was issued to can use it, so a leaked token profiles nothing.
+        return "header" if owner == caller_id(request) else None
+    if settings.PROFILE_SAMPLE_RATE and random.random() < settings.PROFILE_SAMPLE_RATE:
+        return "sample"
+    return None
+
+
+def component(filename, function):
+    where = filename.replace("\\", "/") + ":" + function
+    for name, markers in COMPONENTS:
+        if any(marker in where for marker in markers):
+            return name
+    return "app"
+
+
+def short_path(filename):
+    """`filename` relative to the longest sys.path entry containing it, e.g. rest_framework/fields.py."""
+    prefixes = [entry.rstrip("/") + "/" for entry in sys.path if entry]
+    prefixes = [prefix for prefix in prefixes if filename.startswith(prefix)]
+    return filename[len(max(prefixes, key=len)):] if prefixes else filename
+
+
+def summarize(profiler, top_n):
+    """Top `top_n` functions by cumulative time, plus self time per component in ms."""
+    stats = pstats.Stats(profiler)
+    breakdown = dict.fromkeys([name for name, _ in COMPONENTS] + ["app"], 0.0)
+    functions = []
+    for (filename, line, name), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        breakdown[component(filename, name)] += tottime * 1000
+        functions.append({
+            "function": f"{short_path(filename)}:{line}({name})",
+            "calls": ncalls,
+            "tottime_ms": round(tottime * 1000, 3),
+            "cumtime_ms": round(cumtime * 1000, 3),
+        })
+    functions.sort(key=lambda row: row["cumtime_ms"], reverse=True)
+    return functions[:top_n], {name: round(ms, 3) for name, ms in breakdown.items()}
+
+
+def profile(get_response, request):
+    """Run the request under cProfile; returns (response, profiler) or (response, None) if busy."""
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler already owns this thread.
+        return get_response(request), None
+    try:
+        return get_response(request), profiler
+    finally:
+        profiler.disable()
+
+
+def _slot_key(number):
+    return f"profiles:slot:{number % settings.PROFILE_BUFFER_SIZE}"
+
+
+def store(record):
+    """Append to the ring buffer, overwriting the oldest entry once it is full; returns the id."""
+    cache.add(_SEQUENCE_KEY, 0, timeout=None)
+    try:
+        number = cache.incr(_SEQUENCE_KEY)
+    except ValueError:  # evicted between add and incr
+        number = 1
+        cache.set(_SEQUENCE_KEY, number, timeout=None)
+    record = {"id": number, "captured_at": timezone.now().isoformat(), **record}
+    cache.set(_slot_key(number), record, settings.PROFILE_TTL_SECONDS)
+    return number
+
+
+def get(number):
+    record = cache.get(_slot_key(number))
+    # A slot holds whichever capture last wrapped onto it.
+    return record if record and record["id"] == number else None
+
+
+def recent():
+    """Buffered captures, newest first."""
+    keys = [_slot_key(slot) for slot in range(settings.PROFILE_BUFFER_SIZE)]
+    records = [record for record in cache.get_many(keys).values() if record]
+    return sorted(records, key=lambda record: record["id"], reverse=True)
@@ -0,0 +1,23 @@
+from .authentication import get_profile_ids
+
+
+def profile_ids(request):
+    """(doctor_id, patient_id) for the caller, from the cached user rather than the token claims.
+
+    CachedJWTAuthentication loads both ids with the user and drops them as soon as a profile
+    is created or removed, whereas claims would stay stale until the token expires.
+    """
+    return get_profile_ids(request.user)
+
+
+def scope_by_role(qs, request, doctor_field="doctor_id", patient_field="patient_id"):
+    """Everything for admins; rows whose FK column matches the caller's profile for doctors and patients."""
+    role = request.user.role
+    if role == "ADMIN":
+        return qs
+    doctor_id, patient_id = profile_ids(request)
+    if role == "DOCTOR":
+        return qs.filter(**{doctor_field: doctor_id})
+    if role == "PATIENT":
+        return qs.filter(**{patient_field: patient_id})
+    return qs.none()
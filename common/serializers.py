@@ -0,0 +1,32 @@
+"""Serializer bases whose output time is reported as `serialize` in Server-Timing.
+
+Every serializer in the repo derives from one of these. The time is added to the request's
+QueryStats (common.middleware), so it is only measured for serializers that have the request
+in their context, as get_serializer() provides.
+"""
+
+import time
+
+from rest_framework import serializers
+
+
+class TimedRepresentationMixin:
+    def to_representation(self, instance):
+        stats = getattr(self.context.get("request"), "_query_stats", None)
+        if stats is None or stats.serializing:  # no request, or nested in a serializer already timed
+            return super().to_representation(instance)
+        stats.serializing = True
+        started = time.perf_counter()
+        try:
+            return super().to_representation(instance)
+        finally:
+            stats.serializing = False
+            stats.serialize_duration += time.perf_counter() - started
+
+
+class TimedSerializer(TimedRepresentationMixin, serializers.Serializer):
+    pass
+
+
+class TimedModelSerializer(TimedRepresentationMixin, serializers.ModelSerializer):
+    pass
@@ -0,0 +1,9 @@
+from django.urls import path
+
+from .views import ProfileDetailView, ProfileListView, ProfileTokenView
+
+urlpatterns = [
+    path("_debug/profiles/", ProfileListView.as_view(), name="debug-profiles"),
+    path("_debug/profiles/token/", ProfileTokenView.as_view(), name="debug-profile-token"),
+    path("_debug/profiles/<int:pk>/", ProfileDetailView.as_view(), name="debug-profile-detail"),
+]
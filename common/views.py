@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from . import metrics, profiling
+from .permissions import IsAdminOrInternalNetwork, IsAdminRole
+
+
+class MetricsView(APIView):
+    """Prometheus exposition of request, query and cache metrics, merged across workers."""
+    permission_classes = [IsAdminOrInternalNetwork]
+
+    def get(self, request):
+        body, content_type = metrics.render()
+        return HttpResponse(body, content_type=content_type)
+
+
+class ProfileTokenView(APIView):
+    """Admin: a signed value for the `X-Profile` header, which profiles the admin's own API requests sent with it."""
+    permission_classes = [IsAdminRole]
+
+    def post(self, request):
+        return Response({
+            "header": profiling.HEADER,
+            "token": profiling.issue_token(request.user),
+            "expires_in": settings.PROFILE_TOKEN_MAX_AGE,
+        })
+
+
+class ProfileListView(APIView):
+    """Admin: buffered captures, newest first, without their function tables."""
+    permission_classes = [IsAdminRole]
+
+    def get(self, request):
+        return Response([
+            {key: value for key, value in record.items() if key != "functions"}
+            for record in profiling.recent()
+        ])
+
+
+class ProfileDetailView(APIView):
+    """Admin: one capture with its top functions by cumulative time."""
+    permission_classes = [IsAdminRole]
+
+    def get(self, request, pk):
+        record = profiling.get(pk)
+        if record is None:
+            raise Http404
+        return Response(record)
@@ -3,6 +3,7 @@ from datetime import timedelta
 from pathlib import Path
 
 import dj_database_url
+from corsheaders.defaults import default_headers
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -48,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "common.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -57,6 +59,9 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "common.middleware.ProfilingMiddleware",
+    "common.middleware.QueryInstrumentationMiddleware",
+    "common.middleware.IdempotencyKeyMiddleware",
 ]
 
 ROOT_URLCONF = "hospital_mgmt.urls"
@@ -81,13 +86,16 @@ ASGI_APPLICATION = "hospital_mgmt.asgi.application"
 
 DATABASE_URL = os.getenv("DATABASE_URL", f"sqlite:///{BASE_DIR / 'db.sqlite3'}")
 DATABASES = {"default": dj_database_url.parse(DATABASE_URL, conn_max_age=600)}
+if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    # Take the write lock at BEGIN so check-then-insert paths (appointment overlap) are serialized.
+    DATABASES["default"].setdefault("OPTIONS", {})["transaction_mode"] = "IMMEDIATE"
 
 REDIS_URL = os.getenv("REDIS_URL")
 CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", "300"))
 if REDIS_URL:
     CACHES = {
         "default": {
-            "BACKEND": "django_redis.cache.RedisCache",
+            "BACKEND": "common.cache_backends.RedisCache",
             "LOCATION": REDIS_URL,
             "OPTIONS": {"CLIENT_CLASS": "django_redis.client.DefaultClient"},
             "TIMEOUT": CACHE_TTL_SECONDS,
@@ -96,12 +104,15 @@ if REDIS_URL:
 else:
     CACHES = {
         "default": {
-            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "BACKEND": "common.cache_backends.LocMemCache",
             "LOCATION": "hospital-mgmt-cache",
             "TIMEOUT": CACHE_TTL_SECONDS,
         }
     }
 
+# Per-process LRU in front of the shared cache for JWT-authenticated users.
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "1024"))
+
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
     {"NAME": "django.contrib.auth.password_validation.MinimumLengthValidator"},
@@ -123,12 +134,14 @@ AUTH_USER_MODEL = "accounts.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "common.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
+    "DEFAULT_PAGINATION_CLASS": "common.pagination.CreatedAtCursorPagination",
+    "PAGE_SIZE": int(os.getenv("API_PAGE_SIZE", "50")),
 }
 
 SPECTACULAR_SETTINGS = {
@@ -149,5 +162,29 @@ SIMPLE_JWT = {
 
 CORS_ALLOWED_ORIGINS = [v.strip() for v in os.getenv("CORS_ALLOWED_ORIGINS", "").split(",") if v.strip()]
 CORS_ALLOW_ALL_ORIGINS = os.getenv("CORS_ALLOW_ALL_ORIGINS", "1") == "1"
+CORS_ALLOW_HEADERS = (*default_headers, "idempotency-key", "x-profile")
+
+# Replays of mutating requests that carry an Idempotency-Key header (common.middleware).
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 60 * 60)))
+IDEMPOTENCY_LOCK_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_SECONDS", "30"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "5"))
+
+# Views over their `query_budget` log a warning, or fail the request when this is set (tests).
+QUERY_BUDGET_RAISE = os.getenv("QUERY_BUDGET_RAISE", "0") == "1"
+
+# cProfile captures (common.middleware.ProfilingMiddleware), listed at /api/v1/_debug/profiles/.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOKEN_MAX_AGE = int(os.getenv("PROFILE_TOKEN_MAX_AGE", "3600"))
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "50"))
+PROFILE_TOP_N = int(os.getenv("PROFILE_TOP_N", "40"))
+PROFILE_TTL_SECONDS = int(os.getenv("PROFILE_TTL_SECONDS", str(24 * 60 * 60)))
+
+# /metrics is open to admins, to `Authorization: Metrics <METRICS_SCRAPE_TOKEN>` and to these
+# networks. The check uses REMOTE_ADDR: behind a proxy (Render, nginx) every request comes from
+# the proxy's private address, so never list that range there; use the scrape token instead.
+METRICS_SCRAPE_TOKEN = os.getenv("METRICS_SCRAPE_TOKEN", "")
+METRICS_ALLOWED_NETWORKS = [
+    v.strip() for v in os.getenv("METRICS_ALLOWED_NETWORKS", "127.0.0.0/8,::1/128").split(",") if v.strip()
+]
 
 PATIENT_SELF_SIGNUP_ENABLED = os.getenv("PATIENT_SELF_SIGNUP_ENABLED", "0") == "1"
@@ -1,5 +1,6 @@
 from django.contrib import admin
 
-from .models import Doctor
+from .models import Doctor, WorkingHours
 
 admin.site.register(Doctor)
+admin.site.register(WorkingHours)
@@ -13,3 +13,35 @@ class Doctor(TimeStampedModel):
 
     def __str__(self):
         return f"{self.user.full_name} ({self.specialization})"
+
+
+class WorkingHours(TimeStampedModel):
+    """Weekly template of the hours a doctor takes appointments (local time)."""
+
+    class Weekday(models.IntegerChoices):
+        MONDAY = 0, "Monday"
+        TUESDAY = 1, "Tuesday"
+        WEDNESDAY = 2, "Wednesday"
+        THURSDAY = 3, "Thursday"
+        FRIDAY = 4, "Friday"
+        SATURDAY = 5, "Saturday"
+        SUNDAY = 6, "Sunday"
+
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, related_name="working_hours")
+    weekday = models.PositiveSmallIntegerField(choices=Weekday.choices)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+
+    class Meta:
+        ordering = ["doctor", "weekday", "start_time"]
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(end_time__gt=models.F("start_time")), name="working_hours_end_after_start"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["doctor", "weekday"]),
+        ]
+
+    def __str__(self):
+        return f"{self.doctor_id} {self.get_weekday_display()} {self.start_time}-{self.end_time}"
@@ -1,12 +1,17 @@
+from datetime import timedelta
+
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from rest_framework import serializers
 
+from common.serializers import TimedModelSerializer, TimedSerializer
+
 from .models import Doctor
 
 User = get_user_model()
 
 
-class DoctorSerializer(serializers.ModelSerializer):
+class DoctorSerializer(TimedModelSerializer):
     user_email = serializers.EmailField(source="user.email", read_only=True)
     user_name = serializers.CharField(source="user.full_name", read_only=True)
 
@@ -30,3 +35,37 @@ class DoctorSerializer(serializers.ModelSerializer):
         if value.role != User.Role.DOCTOR:
             raise serializers.ValidationError("User role must be DOCTOR")
         return value
+
+
+class AvailableSlotsQuerySerializer(TimedSerializer):
+    MAX_WINDOW = timedelta(days=31)
+
+    specialization = serializers.CharField(required=False, allow_blank=True)
+    # "from" is a keyword, so the field is renamed in get_fields() below.
+    from_ = serializers.DateTimeField(required=False)
+    to = serializers.DateTimeField(required=False)
+    duration = serializers.IntegerField(min_value=5, max_value=480, default=30, help_text="Slot length in minutes")
+    limit = serializers.IntegerField(min_value=1, max_value=500, default=50, help_text="Max slots per doctor")
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fields["from"] = fields.pop("from_")
+        return fields
+
+    def validate(self, attrs):
+        now = timezone.now()
+        start = max(attrs.get("from") or now, now)
+        end = attrs.get("to") or start + timedelta(days=7)
+        if end <= start:
+            raise serializers.ValidationError({"to": "to must be after from"})
+        if end - start > self.MAX_WINDOW:
+            raise serializers.ValidationError({"to": "Search window cannot exceed 31 days"})
+        attrs["from"], attrs["to"] = start, end
+        return attrs
+
+
+class DoctorSlotsSerializer(TimedSerializer):
+    doctor = serializers.IntegerField()
+    doctor_name = serializers.CharField()
+    specialization = serializers.CharField()
+    slots = serializers.ListField(child=serializers.DictField(child=serializers.DateTimeField()))
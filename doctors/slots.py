@@ -0,0 +1,72 @@
+"""Free-slot search over doctors' working-hour templates and booked appointments."""
+
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.utils import timezone
+
+# Used for doctors without a WorkingHours template: Monday-Saturday, 09:00-17:00.
+DEFAULT_WORKING_HOURS = {weekday: [(time(9), time(17))] for weekday in range(6)}
+
+
+def working_intervals(template, window_start, window_end, tz, step=None):
+    """Lazily expand a {weekday: [(start, end), ...]} template into sorted aware intervals inside the window.
+
+    With a `step`, an interval the window opens inside starts at its next `step` boundary rather
+    than at `window_start` itself, which is usually "now" down to the microsecond.
+    """
+    day = window_start.astimezone(tz).date()
+    last_day = window_end.astimezone(tz).date()
+    while day <= last_day:
+        for start, end in sorted(template.get(day.weekday(), ())):
+            lo = datetime.combine(day, start, tzinfo=tz)
+            if lo < window_start:
+                # Floor division of the negative gap rounds up to the next boundary.
+                lo = lo - (lo - window_start) // step * step if step else window_start
+            hi = min(datetime.combine(day, end, tzinfo=tz), window_end)
+            if lo < hi:
+                yield lo, hi
+        day += timedelta(days=1)
+
+
+def subtract_intervals(free, busy):
+    """Remove sorted busy intervals from sorted, non-overlapping free intervals in one sweep."""
+    i = 0
+    for start, end in free:
+        # Busy intervals ending before this free interval can never matter again.
+        while i < len(busy) and busy[i][1] <= start:
+            i += 1
+        cursor = start
+        j = i
+        while j < len(busy) and busy[j][0] < end:
+            busy_start, busy_end = busy[j]
+            if busy_start > cursor:
+                yield cursor, busy_start
+            cursor = max(cursor, busy_end)
+            j += 1
+        if cursor < end:
+            yield cursor, end
+
+
+def split_into_slots(free, duration):
+    """Cut free intervals into back-to-back slots of `duration`."""
+    for start, end in free:
+        cursor = start
+        while cursor + duration <= end:
+            yield cursor, cursor + duration
+            cursor += duration
+
+
+def available_slots(templates, busy_by_doctor, window_start, window_end, duration, limit=None, tz=None):
+    """Return {doctor_id: [(start, end), ...]} for every doctor in `templates`.
+
+    `busy_by_doctor` maps doctor ids to booked intervals sorted by start time. Every stage
+    is a generator, so with a `limit` only the days needed to fill it are expanded.
+    """
+    tz = tz or timezone.get_current_timezone()
+    result = {}
+    for doctor_id, template in templates.items():
+        free = working_intervals(template, window_start, window_end, tz, step=duration)
+        free = subtract_intervals(free, busy_by_doctor.get(doctor_id, []))
+        result[doctor_id] = list(islice(split_into_slots(free, duration), limit))
+    return result
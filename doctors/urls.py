@@ -1,8 +1,9 @@
 from django.urls import path
 
-from .views import DoctorDetailView, DoctorListCreateView
+from .views import DoctorAvailableSlotsView, DoctorDetailView, DoctorListCreateView
 
 urlpatterns = [
     path("doctors/", DoctorListCreateView.as_view(), name="doctor-list-create"),
     path("doctors/<int:pk>/", DoctorDetailView.as_view(), name="doctor-detail"),
+    path("doctors/available-slots/", DoctorAvailableSlotsView.as_view(), name="doctor-available-slots"),
 ]
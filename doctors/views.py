@@ -1,15 +1,23 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from drf_spectacular.utils import extend_schema
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from appointments.models import Appointment
 from common.permissions import IsAdminRole
 
 from .models import Doctor
-from .serializers import DoctorSerializer
+from .serializers import AvailableSlotsQuerySerializer, DoctorSerializer, DoctorSlotsSerializer
+from .slots import DEFAULT_WORKING_HOURS, available_slots
 
 
 class DoctorListCreateView(generics.ListCreateAPIView):
     serializer_class = DoctorSerializer
-    queryset = Doctor.objects.select_related("user").all().order_by("-created_at")
+    queryset = Doctor.objects.select_related("user").all().order_by("-created_at", "-id")
 
     def get_permissions(self):
         if self.request.method == "POST":
@@ -34,3 +42,61 @@ class DoctorDetailView(generics.RetrieveUpdateAPIView):
         if self.request.method in ["PATCH", "PUT"]:
             return [IsAdminRole()]
         return [IsAuthenticated()]
+
+
+class DoctorAvailableSlotsView(APIView):
+    """Open appointment slots across all doctors matching a specialization."""
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(parameters=[AvailableSlotsQuerySerializer], responses=DoctorSlotsSerializer(many=True))
+    def get(self, request):
+        params = AvailableSlotsQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        window_start, window_end = params.validated_data["from"], params.validated_data["to"]
+
+        doctors = (
+            Doctor.objects.filter(user__is_active=True)
+            .select_related("user").prefetch_related("working_hours").order_by("id")
+        )
+        specialization = params.validated_data.get("specialization")
+        if specialization:
+            doctors = doctors.filter(specialization__iexact=specialization)
+        doctors = list(doctors)
+
+        templates = {}
+        for doctor in doctors:
+            template = defaultdict(list)
+            for hours in doctor.working_hours.all():
+                template[hours.weekday].append((hours.start_time, hours.end_time))
+            templates[doctor.id] = template or DEFAULT_WORKING_HOURS
+
+        # All booked intervals for every matching doctor in one query, already sorted for the sweep.
+        busy = defaultdict(list)
+        booked = (
+            Appointment.objects.filter(
+                doctor_id__in=templates, start_time__lt=window_end, end_time__gt=window_start
+            )
+            .exclude(status=Appointment.Status.CANCELLED)
+            .order_by("doctor_id", "start_time")
+            .values_list("doctor_id", "start_time", "end_time")
+        )
+        for doctor_id, start, end in booked:
+            busy[doctor_id].append((start, end))
+
+        slots = available_slots(
+            templates,
+            busy,
+            window_start,
+            window_end,
+            timedelta(minutes=params.validated_data["duration"]),
+            limit=params.validated_data["limit"],
+        )
+        return Response([
+            {
+                "doctor": doctor.id,
+                "doctor_name": doctor.user.full_name,
+                "specialization": doctor.specialization,
+                "slots": [{"start": start, "end": end} for start, end in slots[doctor.id]],
+            }
+            for doctor in doctors
+        ])
@@ -0,0 +1,25 @@
+"""gunicorn settings; the multiprocess metrics directory must exist before the workers import the app."""
+
+import glob
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", "3"))
+
+# Each worker writes its Prometheus samples to mmap'd files here; /metrics merges them.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "prometheus-metrics"))
+
+
+def on_starting(server):
+    # Samples left by a previous master would otherwise be merged into this one's.
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, "*.db")):
+        os.remove(path)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
@@ -3,9 +3,12 @@ from django.urls import include, path
 from django.views.generic import TemplateView
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
+from common.views import MetricsView
+
 urlpatterns = [
     path("", TemplateView.as_view(template_name="index.html"), name="frontend"),
     path("admin/", admin.site.urls),
+    path("metrics", MetricsView.as_view(), name="metrics"),
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path("api/docs/", SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"),
     path("api/v1/", include("accounts.urls")),
@@ -16,4 +19,5 @@ urlpatterns = [
     path("api/v1/", include("billing.urls")),
     path("api/v1/", include("medicines.urls")),
     path("api/v1/", include("analytics.urls")),
+    path("api/v1/", include("common.urls")),
 ]
@@ -1,6 +1,15 @@
 from django.contrib import admin
 
-from .models import Medicine, SystemSettings
+from .models import Medicine, MedicineBatch, MedicinePriceHistory, SystemSettings
 
 admin.site.register(Medicine)
+admin.site.register(MedicineBatch)
 admin.site.register(SystemSettings)
+
+
+@admin.register(MedicinePriceHistory)
+class MedicinePriceHistoryAdmin(admin.ModelAdmin):
+    list_display = ("medicine", "price", "tax_percent", "effective_from", "changed_by")
+
+    def has_change_permission(self, request, obj=None):
+        return False  # append-only
@@ -0,0 +1,115 @@
+"""Chunked CSV upsert of the medicine catalog, keyed by (name, manufacturer)."""
+
+import csv
+from itertools import islice
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from common.cache import bump_version
+
+from .models import Medicine, MedicinePriceHistory
+from .search import SEARCH_CACHE
+from .serializers import MedicineImportSerializer
+
+UNIQUE_FIELDS = ["name", "manufacturer"]
+UPDATE_FIELDS = [
+    "generic_name", "category", "price", "tax_percent", "requires_prescription", "is_active", "updated_at",
+]
+CHUNK_SIZE = 1000
+
+
+def _chunks(reader, size):
+    # Line numbers count the header as line 1, matching what a spreadsheet shows.
+    numbered = enumerate(reader, start=2)
+    while chunk := list(islice(numbered, size)):
+        yield chunk
+
+
+def _clean(row):
+    # Blank cells fall back to the model defaults instead of failing choice/decimal validation.
+    return {key.strip(): value.strip() for key, value in row.items() if key and value and value.strip()}
+
+
+def decoded_lines(binary_lines):
+    """UTF-8 text of each line in turn, so a bad byte fails on its own line (a leading BOM is dropped)."""
+    for number, line in enumerate(binary_lines, start=1):
+        yield line.decode("utf-8-sig" if number == 1 else "utf-8")
+
+
+class UnreadableCSV(Exception):
+    """The upload stopped decoding as UTF-8 or parsing as CSV at `line`.
+
+    `report` covers the chunks imported before that point, which stay committed.
+    """
+
+    def __init__(self, line, reason, report):
+        super().__init__(f"Line {line}: {reason}")
+        self.line, self.reason, self.report = line, reason, report
+
+
+def import_medicines(lines, chunk_size=CHUNK_SIZE, changed_by=None):
+    """Validate and upsert CSV rows chunk by chunk; returns counts and a per-row error report.
+
+    `lines` is any iterable of CSV text lines with a header row. Rows are validated by one
+    reused serializer and each chunk is written with a single INSERT ... ON CONFLICT in its
+    own transaction, so a bad row never blocks the rest of the file. New medicines and
+    price or tax changes are appended to the price history in the same transaction.
+    Raises UnreadableCSV when the file itself cannot be read past some line.
+    """
+    reader = csv.DictReader(lines)
+    report = {"created": 0, "updated": 0, "errors": []}
+    try:
+        _import_rows(reader, report, chunk_size, changed_by)
+    except (UnicodeDecodeError, csv.Error) as exc:
+        reason = "not valid UTF-8" if isinstance(exc, UnicodeDecodeError) else str(exc)
+        raise UnreadableCSV(reader.line_num + 1, reason, report) from exc
+    finally:
+        # bulk_create sends no signals, so refresh the autocomplete index explicitly.
+        bump_version(SEARCH_CACHE)
+    return report
+
+
+def _import_rows(reader, report, chunk_size, changed_by):
+    missing = {"name", "price"} - {field.strip() for field in reader.fieldnames or ()}
+    if missing:
+        report["errors"].append({"row": 1, "errors": {"header": f"missing columns {sorted(missing)}"}})
+        return
+
+    serializer = MedicineImportSerializer()
+    for chunk in _chunks(reader, chunk_size):
+        # Within a chunk the last row for a key wins; ON CONFLICT cannot touch a row twice.
+        valid = {}
+        for line, row in chunk:
+            try:
+                data = serializer.run_validation(_clean(row))
+            except ValidationError as exc:
+                errors = {field: [str(message) for message in messages] for field, messages in exc.detail.items()}
+                report["errors"].append({"row": line, "errors": errors})
+                continue
+            valid[(data["name"], data.get("manufacturer", ""))] = data
+        if not valid:
+            continue
+        with transaction.atomic():
+            existing = {
+                (name, manufacturer): (price, tax_percent)
+                for name, manufacturer, price, tax_percent in Medicine.objects.filter(
+                    name__in={name for name, _ in valid}
+                ).order_by().values_list(*UNIQUE_FIELDS, "price", "tax_percent")
+            }
+            medicines = Medicine.objects.bulk_create(
+                [Medicine(**data) for data in valid.values()],
+                update_conflicts=True,
+                unique_fields=UNIQUE_FIELDS,
+                update_fields=UPDATE_FIELDS,
+            )
+            MedicinePriceHistory.objects.record(
+                [
+                    medicine for medicine in medicines
+                    if existing.get((medicine.name, medicine.manufacturer)) != (medicine.price, medicine.tax_percent)
+                ],
+                changed_by=changed_by,
+            )
+        updated = len(existing.keys() & valid.keys())
+        report["updated"] += updated
+        report["created"] += len(valid) - updated
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from medicines.importer import CHUNK_SIZE, UnreadableCSV, decoded_lines, import_medicines
+
+
+class Command(BaseCommand):
+    help = "Upsert medicines from a CSV file, keyed by (name, manufacturer)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="UTF-8 CSV with a header row; name and price are required")
+        parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Rows per INSERT ... ON CONFLICT")
+
+    def handle(self, *args, path, chunk_size, **options):
+        try:
+            with open(path, "rb") as binary:
+                report = import_medicines(decoded_lines(binary), chunk_size=chunk_size)
+        except OSError as exc:
+            raise CommandError(exc)
+        except UnreadableCSV as exc:
+            raise CommandError(
+                f"{exc}; created {exc.report['created']}, updated {exc.report['updated']} before it"
+            )
+        for error in report["errors"]:
+            self.stderr.write(f"line {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']}, updated {report['updated']}, rejected {len(report['errors'])} rows"
+        ))
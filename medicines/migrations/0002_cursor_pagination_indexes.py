@@ -0,0 +1,17 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicines', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='medicine',
+            index=models.Index(fields=['name', 'id'], name='medicine_name_id_idx'),
+        ),
+    ]
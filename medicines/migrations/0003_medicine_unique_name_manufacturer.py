@@ -0,0 +1,31 @@
+# Generated by Django 5.1.5 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+
+def disambiguate_duplicates(apps, schema_editor):
+    """Suffix later duplicates of (name, manufacturer) with their id so the constraint can be added."""
+    Medicine = apps.get_model("medicines", "Medicine")
+    seen = set()
+    for medicine in Medicine.objects.order_by("id").only("id", "name", "manufacturer").iterator():
+        key = (medicine.name, medicine.manufacturer)
+        if key in seen:
+            medicine.name = f"{medicine.name[:190]} [#{medicine.id}]"
+            medicine.save(update_fields=["name"])
+        else:
+            seen.add(key)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicines', '0002_cursor_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(disambiguate_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='medicine',
+            constraint=models.UniqueConstraint(fields=('name', 'manufacturer'), name='medicine_unique_name_manufacturer'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:50
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicines', '0003_medicine_unique_name_manufacturer'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicineBatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('batch_number', models.CharField(max_length=50)),
+                ('expiry_date', models.DateField()),
+                ('quantity_received', models.PositiveIntegerField()),
+                ('quantity_remaining', models.PositiveIntegerField()),
+            ],
+            options={
+                'ordering': ['expiry_date', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='medicine',
+            name='reorder_level',
+            field=models.PositiveIntegerField(default=0, help_text='Report as low stock at or below this many units'),
+        ),
+        migrations.AddField(
+            model_name='medicine',
+            name='track_stock',
+            field=models.BooleanField(default=False, help_text='Dispense from batches; prescribing fails when out of stock'),
+        ),
+        migrations.AddIndex(
+            model_name='medicine',
+            index=models.Index(condition=models.Q(('is_active', True), ('track_stock', True)), fields=['name', 'id'], name='medicine_stock_tracked_idx'),
+        ),
+        migrations.AddField(
+            model_name='medicinebatch',
+            name='medicine',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='batches', to='medicines.medicine'),
+        ),
+        migrations.AddIndex(
+            model_name='medicinebatch',
+            index=models.Index(condition=models.Q(('quantity_remaining__gt', 0)), fields=['medicine', 'expiry_date', 'id'], name='batch_fifo_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='medicinebatch',
+            constraint=models.UniqueConstraint(fields=('medicine', 'batch_number'), name='batch_unique_number'),
+        ),
+        migrations.AddConstraint(
+            model_name='medicinebatch',
+            constraint=models.CheckConstraint(condition=models.Q(('quantity_remaining__lte', models.F('quantity_received'))), name='batch_remaining_lte_received'),
+        ),
+    ]
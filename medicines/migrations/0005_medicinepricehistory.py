@@ -0,0 +1,50 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seed_current_prices(apps, schema_editor):
+    """Start each medicine's history with its current price, known since its last update."""
+    Medicine = apps.get_model("medicines", "Medicine")
+    MedicinePriceHistory = apps.get_model("medicines", "MedicinePriceHistory")
+    MedicinePriceHistory.objects.bulk_create(
+        (
+            MedicinePriceHistory(
+                medicine_id=medicine_id, price=price, tax_percent=tax_percent, effective_from=updated_at
+            )
+            for medicine_id, price, tax_percent, updated_at in Medicine.objects.values_list(
+                "id", "price", "tax_percent", "updated_at"
+            ).iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicines', '0004_stock_batches'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MedicinePriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('tax_percent', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('effective_from', models.DateTimeField()),
+                ('changed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('medicine', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='medicines.medicine')),
+            ],
+            options={
+                'verbose_name_plural': 'Medicine price history',
+                'ordering': ['medicine', 'effective_from', 'id'],
+                'indexes': [models.Index(fields=['medicine', 'effective_from', 'id'], name='price_history_as_of_idx')],
+            },
+        ),
+        migrations.RunPython(seed_current_prices, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 21:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicines', '0005_medicinepricehistory'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='medicine',
+            name='manufacturer',
+            field=models.CharField(blank=True, default='', max_length=200),
+        ),
+    ]
@@ -1,7 +1,18 @@
+import copy
+import threading
+from bisect import bisect_right
+
+from django.conf import settings
 from django.db import models
+from django.db.models import F, Q
+from django.utils import timezone
 
+from common.cache import get_version
 from common.models import TimeStampedModel
 
+# Bumped by the SystemSettings signals; every worker reloads on its next read.
+SETTINGS_CACHE = "system_settings"
+
 
 class Medicine(TimeStampedModel):
     """Catalog of medicines with price and tax info."""
@@ -21,19 +32,136 @@ class Medicine(TimeStampedModel):
     name = models.CharField(max_length=200)
     generic_name = models.CharField(max_length=200, blank=True)
     category = models.CharField(max_length=20, choices=Category.choices, default=Category.TABLET)
-    manufacturer = models.CharField(max_length=200, blank=True)
+    # With a default, the (name, manufacturer) uniqueness check leaves it optional in the API.
+    manufacturer = models.CharField(max_length=200, blank=True, default="")
     price = models.DecimalField(max_digits=10, decimal_places=2, help_text="Unit price in ₹")
     tax_percent = models.DecimalField(max_digits=5, decimal_places=2, default=12.00, help_text="GST/tax percentage")
     requires_prescription = models.BooleanField(default=True)
     is_active = models.BooleanField(default=True)
+    track_stock = models.BooleanField(default=False, help_text="Dispense from batches; prescribing fails when out of stock")
+    reorder_level = models.PositiveIntegerField(default=0, help_text="Report as low stock at or below this many units")
 
     class Meta:
         ordering = ["name"]
+        indexes = [
+            models.Index(fields=["name", "id"], name="medicine_name_id_idx"),
+            # Drives the low-stock report without scanning untracked SKUs.
+            models.Index(
+                fields=["name", "id"], name="medicine_stock_tracked_idx", condition=Q(track_stock=True, is_active=True)
+            ),
+        ]
+        constraints = [
+            # The upsert key for catalog imports.
+            models.UniqueConstraint(fields=["name", "manufacturer"], name="medicine_unique_name_manufacturer"),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.category}) - ₹{self.price}"
 
 
+class MedicineBatch(TimeStampedModel):
+    """A received lot of a medicine; prescriptions draw from the earliest-expiring lot first."""
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name="batches")
+    batch_number = models.CharField(max_length=50)
+    expiry_date = models.DateField()
+    quantity_received = models.PositiveIntegerField()
+    quantity_remaining = models.PositiveIntegerField()
+
+    class Meta:
+        ordering = ["expiry_date", "id"]
+        indexes = [
+            # FIFO lookup and on-hand sums only ever touch batches with stock left.
+            models.Index(
+                fields=["medicine", "expiry_date", "id"], name="batch_fifo_idx", condition=Q(quantity_remaining__gt=0)
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["medicine", "batch_number"], name="batch_unique_number"),
+            models.CheckConstraint(
+                condition=Q(quantity_remaining__lte=F("quantity_received")), name="batch_remaining_lte_received"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.medicine_id}/{self.batch_number}: {self.quantity_remaining} left, expires {self.expiry_date}"
+
+
+class MedicinePriceHistoryManager(models.Manager):
+    def record(self, medicines, changed_by=None, effective_from=None):
+        """Append the current price and tax of each medicine as of `effective_from` (default: now)."""
+        effective_from = effective_from or timezone.now()
+        return self.bulk_create([
+            MedicinePriceHistory(
+                medicine_id=medicine.pk,
+                price=medicine.price,
+                tax_percent=medicine.tax_percent,
+                effective_from=effective_from,
+                changed_by=changed_by,
+            )
+            for medicine in medicines
+        ])
+
+    def as_of(self, medicine_id, when):
+        """The entry in force at `when`: one seek on (medicine, effective_from)."""
+        return (
+            self.filter(medicine_id=medicine_id, effective_from__lte=when)
+            .order_by("-effective_from", "-id")
+            .first()
+        )
+
+    def bulk_as_of(self, pairs):
+        """Entries in force for many (medicine_id, when) pairs, in order, with one query.
+
+        A medicine's history is short (one row per price change), so fetching it once and
+        bisecting in memory beats a correlated subquery per pair. Pairs before the first
+        recorded price get None.
+        """
+        if not pairs:
+            return []
+        latest = max(when for _, when in pairs)
+        history = {}
+        rows = (
+            self.filter(medicine_id__in={medicine_id for medicine_id, _ in pairs}, effective_from__lte=latest)
+            .order_by("medicine_id", "effective_from", "id")
+        )
+        for entry in rows:
+            history.setdefault(entry.medicine_id, []).append(entry)
+        starts = {medicine_id: [entry.effective_from for entry in entries] for medicine_id, entries in history.items()}
+        results = []
+        for medicine_id, when in pairs:
+            position = bisect_right(starts.get(medicine_id, []), when)
+            results.append(history[medicine_id][position - 1] if position else None)
+        return results
+
+
+class MedicinePriceHistory(models.Model):
+    """Append-only log of a medicine's price and tax, one row per change."""
+    medicine = models.ForeignKey(Medicine, on_delete=models.CASCADE, related_name="price_history")
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    tax_percent = models.DecimalField(max_digits=5, decimal_places=2)
+    effective_from = models.DateTimeField()
+    changed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+
+    objects = MedicinePriceHistoryManager()
+
+    class Meta:
+        ordering = ["medicine", "effective_from", "id"]
+        verbose_name_plural = "Medicine price history"
+        indexes = [
+            models.Index(fields=["medicine", "effective_from", "id"], name="price_history_as_of_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.medicine_id}: ₹{self.price} (+{self.tax_percent}%) from {self.effective_from:%Y-%m-%d %H:%M}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Price history is append-only; record a new entry instead")
+        super().save(*args, **kwargs)
+
+
 class SystemSettings(models.Model):
     """Singleton settings - only one row should exist."""
     discount_percent = models.DecimalField(
@@ -49,8 +177,23 @@ class SystemSettings(models.Model):
     def __str__(self):
         return f"Discount: {self.discount_percent}%"
 
+    _cached = (None, None)  # (version, instance), per process
+    _cache_lock = threading.Lock()
+
     @classmethod
     def get_settings(cls):
-        """Get or create the singleton settings instance."""
-        obj, _ = cls.objects.get_or_create(pk=1)
-        return obj
+        """The singleton settings, from a per-process copy while the shared version stamp is unchanged.
+
+        Steady-state reads cost one cache lookup; the row is only created on first use.
+        """
+        version = get_version(SETTINGS_CACHE)
+        cached_version, instance = cls._cached
+        if instance is None or cached_version != version:
+            instance = cls.objects.filter(pk=1).first()
+            if instance is None:
+                instance, _ = cls.objects.get_or_create(pk=1)
+                version = get_version(SETTINGS_CACHE)  # creating it bumped the version
+            with cls._cache_lock:
+                cls._cached = (version, instance)
+        # Callers may modify and save what they get, so never hand out the shared instance.
+        return copy.copy(instance)
@@ -0,0 +1,123 @@
+"""Per-process medicine autocomplete index: sorted prefix keys plus a trigram inverted index."""
+
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from collections import defaultdict
+
+import numpy as np
+
+from common.cache import get_version
+
+from .models import Medicine
+
+# Bumped by the Medicine signals and by bulk writes that bypass them.
+SEARCH_CACHE = "medicine_search"
+
+FIELDS = ("id", "name", "generic_name", "category", "manufacturer", "price", "tax_percent", "is_active")
+
+MIN_SIMILARITY = 0.3
+
+
+def normalize(text):
+    """Lowercase, strip accents and collapse everything but letters and digits to single spaces."""
+    text = unicodedata.normalize("NFKD", text or "").encode("ascii", "ignore").decode()
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def trigrams(text):
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class MedicineIndex:
+    """Prefix tiers, best first: whole name, a later word of the name, generic name.
+
+    Each tier is a sorted key list searched with bisect, so a prefix query only walks
+    the hits it returns. Queries that fill fewer than `limit` slots fall back to trigram
+    similarity, scored per field with one NumPy bincount over the posting lists.
+    """
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.active = [row["is_active"] for row in rows]
+        tiers = ([], [], [])
+        grams = defaultdict(list)
+        doc_rows, doc_sizes = [], []
+        for position, row in enumerate(rows):
+            name, generic = normalize(row["name"]), normalize(row["generic_name"])
+            if name:
+                tiers[0].append((name, position))
+                tiers[1].extend((word, position) for word in name.split()[1:])
+            if generic:
+                tiers[2].append((generic, position))
+            # One trigram "doc" per field, so a long generic name cannot dilute a close name match.
+            for text in filter(None, (name, generic)):
+                text_grams = trigrams(text)
+                for gram in text_grams:
+                    grams[gram].append(len(doc_rows))
+                doc_rows.append(position)
+                doc_sizes.append(len(text_grams))
+        self.tiers = []
+        for entries in tiers:
+            entries.sort()
+            self.tiers.append(([key for key, _ in entries], [position for _, position in entries]))
+        self.grams = {gram: np.array(docs, dtype=np.int32) for gram, docs in grams.items()}
+        self.doc_rows = np.array(doc_rows, dtype=np.int64)
+        self.doc_sizes = np.array(doc_sizes, dtype=np.float64)
+
+    @classmethod
+    def build(cls):
+        return cls(list(Medicine.objects.order_by("name", "id").values(*FIELDS)))
+
+    def search(self, query, limit=20, active_only=True):
+        """Best matches for `query`: prefix hits first, then typo-tolerant trigram matches."""
+        query = normalize(query)
+        if not query:
+            return []
+        found = []
+        seen = set()
+
+        def take(position):
+            if position not in seen and (self.active[position] or not active_only):
+                seen.add(position)
+                found.append(position)
+            return len(found) >= limit
+
+        for keys, positions in self.tiers:
+            start, end = bisect_left(keys, query), bisect_left(keys, query + "\uffff")
+            if any(take(position) for position in positions[start:end]):
+                break
+        else:
+            for position in self._similar(query):
+                if take(position):
+                    break
+        return [self.rows[position] for position in found]
+
+    def _similar(self, query):
+        """Row positions whose name or generic name shares enough trigrams with `query`, closest first."""
+        wanted = trigrams(query)
+        postings = [self.grams[gram] for gram in wanted if gram in self.grams]
+        if not postings:
+            return []
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.doc_rows))
+        similarity = shared / (len(wanted) + self.doc_sizes - shared)
+        docs = np.flatnonzero(similarity >= MIN_SIMILARITY)
+        docs = docs[np.argsort(-similarity[docs], kind="stable")]
+        return self.doc_rows[docs].tolist()
+
+
+_index = (None, None)  # (version, MedicineIndex), per process
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """The current index, rebuilt only after a Medicine write has bumped the version."""
+    global _index
+    version = get_version(SEARCH_CACHE)
+    if _index[0] != version:
+        with _index_lock:
+            if _index[0] != version:
+                _index = (version, MedicineIndex.build())
+    return _index[1]
@@ -1,21 +1,117 @@
 from rest_framework import serializers
 
-from .models import Medicine, SystemSettings
+from common.serializers import TimedModelSerializer, TimedSerializer
 
+from .models import Medicine, MedicineBatch, MedicinePriceHistory, SystemSettings
 
-class MedicineSerializer(serializers.ModelSerializer):
+
+class MedicineSerializer(TimedModelSerializer):
     class Meta:
         model = Medicine
         fields = (
             "id", "name", "generic_name", "category", "manufacturer",
             "price", "tax_percent", "requires_prescription", "is_active",
+            "track_stock", "reorder_level",
             "created_at", "updated_at",
         )
         read_only_fields = ("id", "created_at", "updated_at")
 
 
-class SystemSettingsSerializer(serializers.ModelSerializer):
+class MedicineBatchSerializer(TimedModelSerializer):
+    class Meta:
+        model = MedicineBatch
+        fields = (
+            "id", "medicine", "batch_number", "expiry_date",
+            "quantity_received", "quantity_remaining", "created_at",
+        )
+        read_only_fields = ("id", "medicine", "quantity_remaining", "created_at")
+
+    def validate_quantity_received(self, value):
+        if value < 1:
+            raise serializers.ValidationError("Must receive at least one unit")
+        return value
+
+
+class LowStockSerializer(TimedModelSerializer):
+    on_hand = serializers.IntegerField(help_text="Unexpired units left across batches")
+    next_expiry = serializers.DateField(allow_null=True)
+
+    class Meta:
+        model = Medicine
+        fields = ("id", "name", "manufacturer", "reorder_level", "on_hand", "next_expiry")
+
+
+class MedicinePriceHistorySerializer(TimedModelSerializer):
+    class Meta:
+        model = MedicinePriceHistory
+        fields = ("id", "medicine", "price", "tax_percent", "effective_from", "changed_by")
+
+
+class PriceHistoryQuerySerializer(TimedSerializer):
+    at = serializers.DateTimeField(required=False, help_text="Only the entry in force at this instant")
+
+
+class PriceAsOfItemSerializer(TimedSerializer):
+    medicine = serializers.IntegerField(min_value=1)
+    at = serializers.DateTimeField()
+
+
+class PriceAsOfRequestSerializer(TimedSerializer):
+    items = PriceAsOfItemSerializer(many=True, allow_empty=False, max_length=10000)
+
+
+class PriceAsOfResultSerializer(TimedSerializer):
+    medicine = serializers.IntegerField()
+    at = serializers.DateTimeField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2, allow_null=True)
+    tax_percent = serializers.DecimalField(max_digits=5, decimal_places=2, allow_null=True)
+    effective_from = serializers.DateTimeField(allow_null=True, help_text="Null when no price was recorded yet")
+
+
+class MedicineImportSerializer(MedicineSerializer):
+    """Per-row rules for CSV imports; (name, manufacturer) clashes are upserts, not errors."""
+
+    class Meta(MedicineSerializer.Meta):
+        validators = []
+
+
+class MedicineImportFileSerializer(TimedSerializer):
+    file = serializers.FileField(help_text="UTF-8 CSV with a header row; name and price are required")
+
+
+class MedicineImportErrorSerializer(TimedSerializer):
+    row = serializers.IntegerField(help_text="CSV line number, header = 1")
+    errors = serializers.DictField()
+
+
+class MedicineImportReportSerializer(TimedSerializer):
+    created = serializers.IntegerField()
+    updated = serializers.IntegerField()
+    errors = MedicineImportErrorSerializer(many=True)
+
+
+class MedicineSearchQuerySerializer(TimedSerializer):
+    q = serializers.CharField(max_length=100, help_text="Name or generic-name prefix; small typos are tolerated")
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=20)
+
+
+class MedicineSearchResultSerializer(TimedSerializer):
+    id = serializers.IntegerField()
+    name = serializers.CharField()
+    generic_name = serializers.CharField()
+    category = serializers.CharField()
+    manufacturer = serializers.CharField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    tax_percent = serializers.DecimalField(max_digits=5, decimal_places=2)
+    is_active = serializers.BooleanField()
+
+
+class SystemSettingsSerializer(TimedModelSerializer):
     class Meta:
         model = SystemSettings
-        fields = ("discount_percent", "updated_at")
+        fields = ("discount_percent", "updated_at", "apply_to_pending")
         read_only_fields = ("updated_at",)
+
+    apply_to_pending = serializers.BooleanField(
+        write_only=True, default=False, help_text="Also re-apply the discount to every PENDING invoice"
+    )
@@ -0,0 +1,23 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from common.cache import bump_version
+
+from .models import SETTINGS_CACHE, Medicine, SystemSettings
+from .search import SEARCH_CACHE
+
+
+@receiver(post_save, sender=SystemSettings)
+@receiver(post_delete, sender=SystemSettings)
+def invalidate_settings_cache(*args, **kwargs):
+    bump_version(SETTINGS_CACHE)
+    # Again after commit, in case another worker re-cached the old row in between.
+    transaction.on_commit(lambda: bump_version(SETTINGS_CACHE))
+
+
+@receiver(post_save, sender=Medicine)
+@receiver(post_delete, sender=Medicine)
+def invalidate_search_index(*args, **kwargs):
+    bump_version(SEARCH_CACHE)
+    transaction.on_commit(lambda: bump_version(SEARCH_CACHE))
@@ -0,0 +1,109 @@
+"""FIFO stock allocation with batched, self-committing conditional decrements."""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Sum, Min, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Medicine, MedicineBatch
+
+
+class InsufficientStock(Exception):
+    def __init__(self, medicine_ids):
+        super().__init__(f"Not enough unexpired stock for medicines {sorted(medicine_ids)}")
+        self.medicine_ids = medicine_ids
+
+
+def usable_batches(today=None):
+    return MedicineBatch.objects.filter(quantity_remaining__gt=0, expiry_date__gte=today or timezone.localdate())
+
+
+def _plan(demand, rows):
+    """Split `demand` over `rows` [(batch_id, medicine_id, quantity)] in FIFO order; returns (allocations, short)."""
+    available = defaultdict(list)
+    for batch_id, medicine_id, quantity in rows:
+        available[medicine_id].append([batch_id, quantity])
+    allocations, short = {}, set()
+    for key, medicine_id, needed in demand:
+        taken = allocations[key] = []
+        for batch in available[medicine_id]:
+            take = min(needed, batch[1])
+            if take:
+                taken.append((batch[0], take))
+                batch[1] -= take
+                needed -= take
+            if not needed:
+                break
+        if needed:
+            short.add(medicine_id)
+    return allocations, short
+
+
+def _per_batch(allocations):
+    """{batch_id: quantity} summed over every key, and the same as a CASE expression on the batch id."""
+    totals = defaultdict(int)
+    for taken in allocations.values():
+        for batch_id, quantity in taken:
+            totals[batch_id] += quantity
+    case = Case(
+        *[When(pk=batch_id, then=Value(quantity)) for batch_id, quantity in totals.items()],
+        output_field=IntegerField(),
+    )
+    return totals, case
+
+
+def allocate(demand, today=None):
+    """Take `demand` [(key, medicine_id, quantity)] from the earliest-expiring usable batches.
+
+    Returns {key: [(batch_id, quantity)]}. Call it before opening the transaction that records
+    the result: each round is one read and one conditional UPDATE of every batch it draws
+    from, committed on its own, so a batch row is never locked for longer than that statement.
+    A round that loses a race to a concurrent prescription is rolled back and planned again
+    from a fresh read; every lost round means another one went through, so this ends. If the
+    caller's transaction fails afterwards, release() puts the stock back.
+    Raises InsufficientStock, having taken nothing.
+    """
+    if not demand:
+        return {}
+    rows = (
+        usable_batches(today)
+        .filter(medicine_id__in={medicine_id for _, medicine_id, _ in demand})
+        .order_by("medicine_id", "expiry_date", "id")
+        .values_list("id", "medicine_id", "quantity_remaining")
+    )
+    while True:
+        allocations, short = _plan(demand, rows.all())
+        if short:
+            raise InsufficientStock(short)
+        totals, take = _per_batch(allocations)
+        with transaction.atomic():
+            drawn = MedicineBatch.objects.filter(pk__in=totals, quantity_remaining__gte=take).update(
+                quantity_remaining=F("quantity_remaining") - take
+            )
+            if drawn == len(totals):
+                return allocations
+            # A concurrent prescription drew from one of these batches first.
+            transaction.set_rollback(True)
+
+
+def release(allocations):
+    """Give back what allocate() took, in one UPDATE, when the prescription was not saved after all."""
+    totals, taken = _per_batch(allocations)
+    if totals:
+        MedicineBatch.objects.filter(pk__in=totals).update(quantity_remaining=F("quantity_remaining") + taken)
+
+
+def low_stock(today=None):
+    """Tracked, active medicines whose unexpired stock is at or below their reorder level."""
+    usable = Q(batches__quantity_remaining__gt=0, batches__expiry_date__gte=today or timezone.localdate())
+    return (
+        Medicine.objects.filter(track_stock=True, is_active=True)
+        .annotate(
+            on_hand=Coalesce(Sum("batches__quantity_remaining", filter=usable), Value(0)),
+            next_expiry=Min("batches__expiry_date", filter=usable),
+        )
+        .filter(on_hand__lte=F("reorder_level"))
+        .order_by("name", "id")
+    )
@@ -1,9 +1,25 @@
 from django.urls import path
 
-from .views import MedicineDetailView, MedicineListCreateView, SystemSettingsView
+from .views import (
+    LowStockReportView,
+    MedicineBatchListCreateView,
+    MedicineDetailView,
+    MedicineImportView,
+    MedicineListCreateView,
+    MedicinePriceHistoryView,
+    MedicineSearchView,
+    PriceAsOfView,
+    SystemSettingsView,
+)
 
 urlpatterns = [
     path("medicines/", MedicineListCreateView.as_view(), name="medicine-list"),
+    path("medicines/import/", MedicineImportView.as_view(), name="medicine-import"),
+    path("medicines/low-stock/", LowStockReportView.as_view(), name="medicine-low-stock"),
+    path("medicines/<int:pk>/batches/", MedicineBatchListCreateView.as_view(), name="medicine-batches"),
+    path("medicines/<int:pk>/price-history/", MedicinePriceHistoryView.as_view(), name="medicine-price-history"),
+    path("medicines/prices-as-of/", PriceAsOfView.as_view(), name="medicine-prices-as-of"),
+    path("medicines/search/", MedicineSearchView.as_view(), name="medicine-search"),
     path("medicines/<int:pk>/", MedicineDetailView.as_view(), name="medicine-detail"),
     path("settings/", SystemSettingsView.as_view(), name="system-settings"),
 ]
@@ -1,17 +1,40 @@
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from drf_spectacular.utils import extend_schema
 from rest_framework import generics, status
+from rest_framework.parsers import MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from billing.models import Invoice
+from common.pagination import EffectiveFromCursorPagination, NameCursorPagination
 from common.permissions import IsAdminRole
 
-from .models import Medicine, SystemSettings
-from .serializers import MedicineSerializer, SystemSettingsSerializer
+from .importer import UnreadableCSV, decoded_lines, import_medicines
+from .models import Medicine, MedicineBatch, MedicinePriceHistory, SystemSettings
+from .search import get_index
+from .serializers import (
+    LowStockSerializer,
+    MedicineBatchSerializer,
+    MedicineImportFileSerializer,
+    MedicineImportReportSerializer,
+    MedicinePriceHistorySerializer,
+    MedicineSearchQuerySerializer,
+    MedicineSearchResultSerializer,
+    MedicineSerializer,
+    PriceAsOfRequestSerializer,
+    PriceAsOfResultSerializer,
+    PriceHistoryQuerySerializer,
+    SystemSettingsSerializer,
+)
+from .stock import low_stock
 
 
 class MedicineListCreateView(generics.ListCreateAPIView):
     """GET: all authenticated users can list active medicines. POST: admin only."""
     serializer_class = MedicineSerializer
+    pagination_class = NameCursorPagination
 
     def get_queryset(self):
         qs = Medicine.objects.all()
@@ -24,6 +47,76 @@ class MedicineListCreateView(generics.ListCreateAPIView):
             return [IsAdminRole()]
         return [IsAuthenticated()]
 
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            medicine = serializer.save()
+            MedicinePriceHistory.objects.record([medicine], changed_by=self.request.user)
+
+
+class MedicineImportView(APIView):
+    """Admin: upsert the catalog from a CSV upload, keyed by (name, manufacturer)."""
+    permission_classes = [IsAdminRole]
+    parser_classes = [MultiPartParser]
+
+    @extend_schema(request=MedicineImportFileSerializer, responses=MedicineImportReportSerializer)
+    def post(self, request):
+        upload = MedicineImportFileSerializer(data=request.data)
+        upload.is_valid(raise_exception=True)
+        # Decoded line by line, so the upload is never held in memory as one string.
+        lines = decoded_lines(upload.validated_data["file"])
+        # Valid rows are committed even when others are rejected, so this is a 200 with a report
+        # unless the file itself stops being readable CSV; then the 400 names the line.
+        try:
+            report = import_medicines(lines, changed_by=request.user)
+        except UnreadableCSV as exc:
+            return Response({"detail": str(exc), "row": exc.line, **exc.report}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report)
+
+
+class MedicineBatchListCreateView(generics.ListCreateAPIView):
+    """Admin: receive stock batches for a medicine and list those with units left."""
+    serializer_class = MedicineBatchSerializer
+    permission_classes = [IsAdminRole]
+
+    def get_queryset(self):
+        return MedicineBatch.objects.filter(medicine_id=self.kwargs["pk"], quantity_remaining__gt=0)
+
+    def perform_create(self, serializer):
+        medicine = get_object_or_404(Medicine, pk=self.kwargs["pk"])
+        with transaction.atomic():
+            serializer.save(medicine=medicine, quantity_remaining=serializer.validated_data["quantity_received"])
+            if not medicine.track_stock:
+                medicine.track_stock = True
+                medicine.save(update_fields=["track_stock", "updated_at"])
+
+
+class LowStockReportView(generics.ListAPIView):
+    """Admin: tracked medicines at or below their reorder level, counting only unexpired units."""
+    serializer_class = LowStockSerializer
+    permission_classes = [IsAdminRole]
+    pagination_class = None
+
+    def get_queryset(self):
+        return low_stock()
+
+
+class MedicineSearchView(APIView):
+    """Autocomplete from the in-memory index: ranked prefix matches, then close spellings."""
+    # Served from the in-memory index; a rebuild is one query.
+    query_budget = 3
+    permission_classes = [IsAuthenticated]
+
+    @extend_schema(parameters=[MedicineSearchQuerySerializer], responses=MedicineSearchResultSerializer(many=True))
+    def get(self, request):
+        params = MedicineSearchQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        results = get_index().search(
+            params.validated_data["q"],
+            limit=params.validated_data["limit"],
+            active_only=request.user.role != "ADMIN",
+        )
+        return Response(MedicineSearchResultSerializer(results, many=True, context={"request": request}).data)
+
 
 class MedicineDetailView(generics.RetrieveUpdateDestroyAPIView):
     """GET: authenticated, PUT/PATCH/DELETE: admin only."""
@@ -35,6 +128,55 @@ class MedicineDetailView(generics.RetrieveUpdateDestroyAPIView):
             return [IsAdminRole()]
         return [IsAuthenticated()]
 
+    def perform_update(self, serializer):
+        before = (serializer.instance.price, serializer.instance.tax_percent)
+        with transaction.atomic():
+            medicine = serializer.save()
+            if (medicine.price, medicine.tax_percent) != before:
+                MedicinePriceHistory.objects.record([medicine], changed_by=self.request.user)
+
+
+class MedicinePriceHistoryView(generics.ListAPIView):
+    """A medicine's price changes, newest first; `?at=` narrows it to the entry in force then."""
+    serializer_class = MedicinePriceHistorySerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = EffectiveFromCursorPagination
+
+    @extend_schema(parameters=[PriceHistoryQuerySerializer])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+    def get_queryset(self):
+        params = PriceHistoryQuerySerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        qs = MedicinePriceHistory.objects.filter(medicine_id=self.kwargs["pk"])
+        if "at" in params.validated_data:
+            entry = MedicinePriceHistory.objects.as_of(self.kwargs["pk"], params.validated_data["at"])
+            qs = qs.filter(pk=entry.pk if entry else None)
+        return qs
+
+
+class PriceAsOfView(APIView):
+    """Admin: price and tax in force for many (medicine, instant) pairs, for reconciling items in bulk."""
+    permission_classes = [IsAdminRole]
+
+    @extend_schema(request=PriceAsOfRequestSerializer, responses=PriceAsOfResultSerializer(many=True))
+    def post(self, request):
+        body = PriceAsOfRequestSerializer(data=request.data)
+        body.is_valid(raise_exception=True)
+        pairs = [(item["medicine"], item["at"]) for item in body.validated_data["items"]]
+        entries = MedicinePriceHistory.objects.bulk_as_of(pairs)
+        return Response(PriceAsOfResultSerializer([
+            {
+                "medicine": medicine_id,
+                "at": at,
+                "price": entry and entry.price,
+                "tax_percent": entry and entry.tax_percent,
+                "effective_from": entry and entry.effective_from,
+            }
+            for (medicine_id, at), entry in zip(pairs, entries)
+        ], many=True, context={"request": request}).data)
+
 
 class SystemSettingsView(APIView):
     """GET: any authenticated user. PUT/PATCH: admin only."""
@@ -42,16 +184,20 @@ class SystemSettingsView(APIView):
 
     def get(self, request):
         settings = SystemSettings.get_settings()
-        return Response(SystemSettingsSerializer(settings).data)
+        return Response(SystemSettingsSerializer(settings, context={"request": request}).data)
 
     def put(self, request):
         if request.user.role != "ADMIN":
             return Response({"detail": "Only admin can update settings"}, status=status.HTTP_403_FORBIDDEN)
         settings = SystemSettings.get_settings()
-        serializer = SystemSettingsSerializer(settings, data=request.data)
+        serializer = SystemSettingsSerializer(settings, data=request.data, context={"request": request})
         serializer.is_valid(raise_exception=True)
-        serializer.save()
-        return Response(serializer.data)
+        apply_to_pending = serializer.validated_data.pop("apply_to_pending")
+        settings = serializer.save()
+        data = dict(serializer.data)
+        if apply_to_pending:
+            data["repriced_invoices"] = Invoice.objects.reprice_pending(settings.discount_percent)
+        return Response(data)
 
     def patch(self, request):
         return self.put(request)
@@ -1,12 +1,14 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
+from common.serializers import TimedModelSerializer
+
 from .models import Patient
 
 User = get_user_model()
 
 
-class PatientSerializer(serializers.ModelSerializer):
+class PatientSerializer(TimedModelSerializer):
     user_email = serializers.EmailField(source="user.email", read_only=True)
     user_name = serializers.CharField(source="user.full_name", read_only=True)
 
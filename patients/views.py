@@ -14,7 +14,7 @@ class PatientListCreateView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        qs = Patient.objects.select_related("user").all()
+        qs = Patient.objects.select_related("user").all().order_by("-created_at", "-id")
         user = self.request.user
         if user.role == "ADMIN":
             return qs
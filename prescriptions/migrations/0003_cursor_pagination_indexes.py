@@ -0,0 +1,20 @@
+# Generated by Django 5.1.5 on 2026-10-18 19:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('appointments', '0002_cursor_pagination_indexes'),
+        ('prescriptions', '0002_remove_prescription_medicines_json_prescriptionitem'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='prescription',
+            index=models.Index(fields=['-created_at', '-id'], name='prescription_created_id_idx'),
+        ),
+    ]
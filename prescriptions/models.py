@@ -11,6 +11,11 @@ class Prescription(TimeStampedModel):
     instructions = models.TextField(blank=True)
     created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.PROTECT, related_name="prescriptions")
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["-created_at", "-id"], name="prescription_created_id_idx"),
+        ]
+
     def __str__(self):
         return f"Prescription #{self.pk}"
 
@@ -41,3 +46,13 @@ class PrescriptionItem(TimeStampedModel):
     @property
     def line_tax(self):
         return self.line_total * self.tax_percent / 100
+
+
+class PrescriptionItemBatch(models.Model):
+    """Which stock batches an item was dispensed from, for recalls and expiry audits."""
+    item = models.ForeignKey(PrescriptionItem, on_delete=models.CASCADE, related_name="allocations")
+    batch = models.ForeignKey("medicines.MedicineBatch", on_delete=models.PROTECT, related_name="allocations")
+    quantity = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"item {self.item_id} <- batch {self.batch_id} x{self.quantity}"
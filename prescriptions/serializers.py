@@ -1,20 +1,27 @@
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
 
+from appointments.models import Appointment
+from common.serializers import TimedModelSerializer, TimedSerializer
 from medicines.models import Medicine
+from medicines.stock import InsufficientStock, allocate, release
 
-from .models import Prescription, PrescriptionItem
+from .models import Prescription, PrescriptionItem, PrescriptionItemBatch
 
 
-class PrescriptionItemWriteSerializer(serializers.Serializer):
+class PrescriptionItemWriteSerializer(TimedSerializer):
     """For creating prescription items — doctor sends medicine ID, qty, dosage, frequency."""
-    medicine = serializers.PrimaryKeyRelatedField(queryset=Medicine.objects.filter(is_active=True))
+    # Resolved in one batch by PrescriptionSerializer.validate_medicines
+    medicine = serializers.IntegerField(min_value=1)
     quantity = serializers.IntegerField(min_value=1, default=1)
     dosage = serializers.CharField(max_length=100)
     frequency = serializers.CharField(max_length=100)
     duration_days = serializers.IntegerField(min_value=1, default=7)
 
 
-class PrescriptionItemReadSerializer(serializers.ModelSerializer):
+class PrescriptionItemReadSerializer(TimedModelSerializer):
     medicine_name = serializers.CharField(source="medicine.name", read_only=True)
     medicine_category = serializers.CharField(source="medicine.category", read_only=True)
     line_total = serializers.DecimalField(max_digits=10, decimal_places=2, read_only=True)
@@ -29,7 +36,12 @@ class PrescriptionItemReadSerializer(serializers.ModelSerializer):
         )
 
 
-class PrescriptionSerializer(serializers.ModelSerializer):
+class PrescriptionSerializer(TimedModelSerializer):
+    # Doctor and any existing invoice are joined in, as perform_create needs both
+    appointment = serializers.PrimaryKeyRelatedField(
+        queryset=Appointment.objects.select_related("doctor", "invoice"),
+        validators=[UniqueValidator(queryset=Prescription.objects.all())],
+    )
     items = PrescriptionItemReadSerializer(many=True, read_only=True)
     medicines = PrescriptionItemWriteSerializer(many=True, write_only=True, required=False)
 
@@ -42,21 +54,71 @@ class PrescriptionSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ("id", "created_by", "created_at", "updated_at")
 
+    def validate_medicines(self, value):
+        """Fetch every referenced medicine in one query."""
+        medicines = Medicine.objects.filter(is_active=True).in_bulk({item["medicine"] for item in value})
+        errors = [
+            {} if item["medicine"] in medicines
+            else {"medicine": [f'Invalid pk "{item["medicine"]}" - object does not exist.']}
+            for item in value
+        ]
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        for item in value:
+            item["medicine"] = medicines[item["medicine"]]
+        return value
+
+    allocations = None
+
+    def take_stock(self):
+        """Take the stock-tracked lines from their batches, FIFO by expiry, ahead of save().
+
+        Call it before opening the transaction that saves the prescription, so batch rows are
+        locked for one statement only; if that transaction fails, call release_stock().
+        """
+        lines = self.validated_data.get("medicines", [])
+        demand = [
+            (index, line["medicine"].id, line.get("quantity", 1))
+            for index, line in enumerate(lines) if line["medicine"].track_stock
+        ]
+        try:
+            self.allocations = allocate(demand)
+        except InsufficientStock as exc:
+            names = sorted({line["medicine"].name for line in lines if line["medicine"].id in exc.medicine_ids})
+            raise serializers.ValidationError({"medicines": [f"Not enough stock: {', '.join(names)}"]}) from exc
+
+    def release_stock(self):
+        release(self.allocations or {})
+        self.allocations = None
+
     def create(self, validated_data):
         medicines_data = validated_data.pop("medicines", [])
-        prescription = Prescription.objects.create(**validated_data)
-
-        for med_data in medicines_data:
-            medicine = med_data["medicine"]
-            PrescriptionItem.objects.create(
-                prescription=prescription,
-                medicine=medicine,
-                quantity=med_data.get("quantity", 1),
-                dosage=med_data["dosage"],
-                frequency=med_data["frequency"],
-                duration_days=med_data.get("duration_days", 7),
-                unit_price=medicine.price,       # Snapshot current price
-                tax_percent=medicine.tax_percent, # Snapshot current tax
-            )
+        if self.allocations is None:
+            self.take_stock()
+        with transaction.atomic():
+            prescription = Prescription.objects.create(**validated_data)
+            items = PrescriptionItem.objects.bulk_create([
+                PrescriptionItem(
+                    prescription=prescription,
+                    medicine=med_data["medicine"],
+                    quantity=med_data.get("quantity", 1),
+                    dosage=med_data["dosage"],
+                    frequency=med_data["frequency"],
+                    duration_days=med_data.get("duration_days", 7),
+                    unit_price=med_data["medicine"].price,        # Snapshot current price
+                    tax_percent=med_data["medicine"].tax_percent,  # Snapshot current tax
+                )
+                for med_data in medicines_data
+            ])
+            # Which batches each item was dispensed from; untracked items have none.
+            PrescriptionItemBatch.objects.bulk_create([
+                PrescriptionItemBatch(item=items[index], batch_id=batch_id, quantity=quantity)
+                for index, taken in self.allocations.items()
+                for batch_id, quantity in taken
+            ])
 
+        # One query loads the items with their medicines for the invoice totals and the response.
+        prefetch_related_objects(
+            [prescription], Prefetch("items", queryset=PrescriptionItem.objects.select_related("medicine"))
+        )
         return prescription
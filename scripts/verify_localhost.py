@@ -1,36 +1,307 @@
+"""Check that the API comes up on localhost and, with --load, load-test it.
+
+    python scripts/verify_localhost.py
+    python scripts/verify_localhost.py --load --duration 60 --concurrency 16 --output run.json
+    python scripts/verify_localhost.py --url http://staging:8000 --load --baseline baseline.json
+
+Without --url a `runserver` is started for the run. The load test logs in as each role
+and replays a weighted mix of the frontend's calls from a thread pool, then reports
+throughput and p50/p95/p99 latency per endpoint. With --baseline, an endpoint whose p95
+grew by more than --max-regression (and by at least --min-delta-ms), or whose error rate
+went up, fails the run with exit status 1.
+"""
+
+import argparse
+import http.client
+import json
+import random
 import subprocess
 import sys
+import threading
 import time
+import urllib.parse
 import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 
+DEFAULT_URL = "http://127.0.0.1:8000"
+# Accounts created by seed.py.
+DEFAULT_CREDENTIALS = {
+    "ADMIN": "admin@example.com:admin123",
+    "DOCTOR": "doctor@example.com:doctor123",
+    "PATIENT": "patient@example.com:patient123",
+}
 
-def main() -> int:
-    proc = subprocess.Popen(
+# (name, role, method, path, weight). `{invoice}` is the patient's first PENDING invoice: the
+# run's first payment succeeds, later ones answer 409, and the invoice is put back to PENDING
+# afterwards, so every run measures the same calls against the same data. There is no
+# appointment write: the only repeatable one re-saves the same status, which still bumps the
+# dashboard cache on every call and would turn the dashboard line into a cache-miss benchmark.
+MIX = [
+    ("GET /appointments/ (doctor)", "DOCTOR", "GET", "/api/v1/appointments/", 12),
+    ("GET /prescriptions/ (doctor)", "DOCTOR", "GET", "/api/v1/prescriptions/", 8),
+    ("GET /appointments/ (patient)", "PATIENT", "GET", "/api/v1/appointments/", 8),
+    ("GET /invoices/ (patient)", "PATIENT", "GET", "/api/v1/invoices/", 6),
+    ("GET /prescriptions/ (patient)", "PATIENT", "GET", "/api/v1/prescriptions/", 4),
+    ("GET /invoices/ (admin)", "ADMIN", "GET", "/api/v1/invoices/", 5),
+    ("GET /dashboard/overview/", "ADMIN", "GET", "/api/v1/dashboard/overview/", 4),
+    ("GET /medicines/search/", "DOCTOR", "GET", "/api/v1/medicines/search/?q=para", 4),
+    ("GET /auth/me/", "PATIENT", "GET", "/api/v1/auth/me/", 3),
+    ("PATCH /invoices/{id}/status/", "PATIENT", "PATCH", "/api/v1/invoices/{invoice}/status/", 2),
+]
+EXPECTED_STATUSES = {"PATCH /invoices/{id}/status/": {200, 409}}
+
+
+def start_server() -> subprocess.Popen:
+    return subprocess.Popen(
         [sys.executable, "-u", "manage.py", "runserver", "127.0.0.1:8000", "--noreload"],
         stdout=subprocess.DEVNULL,
         stderr=subprocess.DEVNULL,
     )
 
+
+def wait_until_up(base_url: str, proc: subprocess.Popen | None) -> bool:
+    for _ in range(40):
+        if proc is not None and proc.poll() is not None:
+            print("runserver exited before becoming reachable.")
+            return False
+        try:
+            with urllib.request.urlopen(f"{base_url}/api/schema/", timeout=1) as response:
+                print(f"Localhost check status: {response.status}")
+                return True
+        except Exception:
+            time.sleep(0.5)
+    print("Could not reach localhost endpoint within timeout.")
+    return False
+
+
+class Client:
+    """Logs in per role, re-logs in on 401, and opens a fresh connection per request.
+
+    Reusing connections would measure runserver's keep-alive handling (a ~40 ms delayed-ACK
+    stall per response) rather than the app, and gunicorn's sync workers close them anyway.
+    """
+
+    def __init__(self, base_url: str, credentials: dict[str, str]):
+        parts = urllib.parse.urlsplit(base_url)
+        self.host, self.port, self.https = parts.hostname, parts.port, parts.scheme == "https"
+        self.credentials = credentials
+        self.tokens: dict[str, str] = {}
+        self.login_lock = threading.Lock()
+
+    def request(self, method: str, path: str, body=None, token: str | None = None) -> tuple[int, bytes]:
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        payload = json.dumps(body).encode() if body is not None else None
+        factory = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        connection = factory(self.host, self.port, timeout=30)
+        try:
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            return response.status, response.read()
+        finally:
+            connection.close()
+
+    def login(self, role: str, stale: str | None = None) -> str:
+        with self.login_lock:
+            if self.tokens.get(role) and self.tokens[role] != stale:
+                return self.tokens[role]
+            email, password = self.credentials[role].split(":", 1)
+            status, content = self.request("POST", "/api/v1/auth/login/", {"email": email, "password": password})
+            if status != 200:
+                raise SystemExit(f"Login as {role} ({email}) failed with {status}: {content[:200]!r}")
+            self.tokens[role] = json.loads(content)["access"]
+            return self.tokens[role]
+
+    def call(self, role: str, method: str, path: str, body=None) -> tuple[int, bytes]:
+        token = self.tokens.get(role) or self.login(role)
+        status, content = self.request(method, path, body, token)
+        if status == 401:
+            status, content = self.request(method, path, body, self.login(role, stale=token))
+        return status, content
+
+
+def first_id(client: Client, role: str, path: str, **match) -> int | None:
+    status, content = client.call(role, "GET", path)
+    if status != 200:
+        return None
+    rows = json.loads(content)
+    rows = rows["results"] if isinstance(rows, dict) else rows
+    return next((row["id"] for row in rows if all(row.get(k) == v for k, v in match.items())), None)
+
+
+def prepare_mix(client: Client) -> list[tuple]:
+    """The call mix with ids filled in; calls whose role owns no suitable row are dropped."""
+    ids = {"invoice": first_id(client, "PATIENT", "/api/v1/invoices/", status="PENDING")}
+    bodies = {"invoice": {"status": "PAID", "payment_method": "UPI"}}
+    calls = []
+    for name, role, method, path, weight in MIX:
+        placeholder = next((key for key in ids if f"{{{key}}}" in path), None)
+        if placeholder and ids[placeholder] is None:
+            print(f"Skipping {name}: no {placeholder} visible to {role}")
+            continue
+        if placeholder:
+            path = path.format(**{placeholder: ids[placeholder]})
+        calls.append((name, role, method, path, bodies.get(placeholder), weight))
+    return calls
+
+
+def restore(client: Client, calls: list[tuple]) -> None:
+    """Put the invoice the run paid back to PENDING (as admin), moving the revenue rollup back."""
+    for name, _, method, path, _, _ in calls:
+        if method != "PATCH":
+            continue
+        status, content = client.call(
+            "ADMIN", "PATCH", path, {"status": "PENDING", "payment_method": "", "paid_at": None}
+        )
+        if status != 200:
+            print(f"Could not restore {path} after {name}: {status} {content[:200]!r}")
+
+
+def percentile(ordered: list[float], share: float) -> float:
+    # Nearest rank, so p99 of a small run is an observed value rather than an interpolation.
+    return ordered[min(len(ordered) - 1, max(0, round(share * len(ordered)) - 1))]
+
+
+def summarize(samples: list[tuple[float, bool]], elapsed: float) -> dict:
+    latencies = sorted(latency * 1000 for latency, _ in samples)
+    errors = sum(1 for _, ok in samples if not ok)
+    return {
+        "requests": len(samples),
+        "errors": errors,
+        "error_rate": round(errors / len(samples), 4),
+        "throughput_rps": round(len(samples) / elapsed, 2),
+        "mean_ms": round(sum(latencies) / len(latencies), 2),
+        "p50_ms": round(percentile(latencies, 0.50), 2),
+        "p95_ms": round(percentile(latencies, 0.95), 2),
+        "p99_ms": round(percentile(latencies, 0.99), 2),
+        "max_ms": round(latencies[-1], 2),
+    }
+
+
+def run_load(client: Client, duration: float, concurrency: int, warmup: float, seed: int | None) -> dict:
+    calls = prepare_mix(client)
+    for role in {call[1] for call in calls}:
+        client.login(role)
+    weights = [call[-1] for call in calls]
+    samples: dict[str, list[tuple[float, bool]]] = {call[0]: [] for call in calls}
+    samples_lock = threading.Lock()
+    started = time.perf_counter()
+    record_from, stop_at = started + warmup, started + warmup + duration
+
+    def worker(number: int) -> None:
+        rng = random.Random(None if seed is None else seed + number)
+        while (now := time.perf_counter()) < stop_at:
+            name, role, method, path, body, _ = rng.choices(calls, weights)[0]
+            try:
+                status, _ = client.call(role, method, path, body)
+            except (http.client.HTTPException, OSError):
+                status = 0
+            latency = time.perf_counter() - now
+            if now >= record_from:
+                ok = status in EXPECTED_STATUSES.get(name, {200})
+                with samples_lock:
+                    samples[name].append((latency, ok))
+
     try:
-        for _ in range(40):
-            if proc.poll() is not None:
-                print("runserver exited before becoming reachable.")
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(worker, range(concurrency)))
+    finally:
+        restore(client, calls)
+
+    every = [sample for rows in samples.values() for sample in rows]
+    if not every:
+        raise SystemExit("No requests completed; is the server up and the data seeded?")
+    return {
+        "meta": {
+            "url": f"{'https' if client.https else 'http'}://{client.host}:{client.port}",
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "duration_s": duration,
+            "concurrency": concurrency,
+        },
+        "total": summarize(every, duration),
+        "endpoints": {name: summarize(rows, duration) for name, rows in samples.items() if rows},
+    }
+
+
+def print_report(result: dict) -> None:
+    header = f"{'endpoint':<36} {'reqs':>7} {'err%':>6} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, stats in [*result["endpoints"].items(), ("TOTAL", result["total"])]:
+        print(
+            f"{name:<36} {stats['requests']:>7} {stats['error_rate'] * 100:>6.1f} {stats['throughput_rps']:>8.1f} "
+            f"{stats['p50_ms']:>8.1f} {stats['p95_ms']:>8.1f} {stats['p99_ms']:>8.1f}"
+        )
+
+
+def compare(result: dict, baseline: dict, max_regression: float, min_delta_ms: float) -> list[str]:
+    """Endpoints whose p95 or error rate got meaningfully worse than in `baseline`."""
+    regressions = []
+    for name, stats in result["endpoints"].items():
+        before = baseline.get("endpoints", {}).get(name)
+        if before is None:
+            continue
+        delta = stats["p95_ms"] - before["p95_ms"]
+        if delta >= min_delta_ms and stats["p95_ms"] > before["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {before['p95_ms']:.1f} -> {stats['p95_ms']:.1f} ms")
+        if stats["error_rate"] > before["error_rate"] + 0.01:
+            regressions.append(f"{name}: error rate {before['error_rate']:.2%} -> {stats['error_rate']:.2%}")
+    return regressions
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help=f"Test a running server instead of starting runserver ({DEFAULT_URL})")
+    parser.add_argument("--load", action="store_true", help="Run the load test after the reachability check")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="Seconds of load before measuring")
+    parser.add_argument("--concurrency", type=int, default=8, help="Worker threads")
+    parser.add_argument("--seed", type=int, help="Make the request sequence reproducible")
+    for role, default in DEFAULT_CREDENTIALS.items():
+        parser.add_argument(f"--{role.lower()}", default=default, metavar="EMAIL:PASSWORD")
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="Results JSON of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed relative p95 growth")
+    parser.add_argument("--min-delta-ms", type=float, default=5, help="Ignore p95 growth smaller than this")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    base_url = (args.url or DEFAULT_URL).rstrip("/")
+    proc = None if args.url else start_server()
+
+    try:
+        if not wait_until_up(base_url, proc):
+            return 1
+        if not args.load:
+            return 0
+
+        credentials = {role: getattr(args, role.lower()) for role in DEFAULT_CREDENTIALS}
+        result = run_load(Client(base_url, credentials), args.duration, args.concurrency, args.warmup, args.seed)
+        print_report(result)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as handle:
+                json.dump(result, handle, indent=2)
+            print(f"Results written to {args.output}")
+        if args.baseline:
+            with open(args.baseline, encoding="utf-8") as handle:
+                regressions = compare(result, json.load(handle), args.max_regression, args.min_delta_ms)
+            for line in regressions:
+                print(f"REGRESSION {line}")
+            if regressions:
                 return 1
-            try:
-                with urllib.request.urlopen("http://127.0.0.1:8000/api/schema/", timeout=1) as response:
-                    print(f"Localhost check status: {response.status}")
-                    return 0
-            except Exception:
-                time.sleep(0.5)
-
-        print("Could not reach localhost endpoint within timeout.")
-        return 1
+            print(f"No regressions against {args.baseline}")
+        return 0
     finally:
-        proc.terminate()
-        try:
-            proc.wait(timeout=5)
-        except subprocess.TimeoutExpired:
-            proc.kill()
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
 
 
 if __name__ == "__main__":
@@ -11,4 +11,4 @@ echo "=== Seeding database ==="
 python seed.py
 
 echo "=== Starting server ==="
-gunicorn hospital_mgmt.wsgi:application --bind 0.0.0.0:${PORT:-8000}
+WEB_CONCURRENCY=${WEB_CONCURRENCY:-1} gunicorn hospital_mgmt.wsgi:application --config gunicorn.conf.py
@@ -1,20 +1,40 @@
-from datetime import timedelta
+import csv
+import json
+import threading
+from datetime import time, timedelta
 from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Count, F, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.utils import timezone
 from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
 from appointments.models import Appointment
-from billing.models import Invoice
-from doctors.models import Doctor
+from appointments.views import AppointmentListCreateView
+from billing.models import DailyRevenue, Invoice
+from common.authentication import load_user_payload
+from common.cache import get_version
+from common.middleware import QueryBudgetExceeded
+from doctors.models import Doctor, WorkingHours
+from medicines import stock
+from medicines.models import Medicine, MedicineBatch, MedicinePriceHistory, SystemSettings
 from patients.models import Patient
+from prescriptions.models import Prescription, PrescriptionItem
+from prescriptions.views import PrescriptionListCreateView
 
 User = get_user_model()
 
 
+@override_settings(QUERY_BUDGET_RAISE=True)
 class HospitalAPITestCase(TestCase):
     def setUp(self):
         cache.clear()
@@ -225,7 +245,7 @@ class HospitalAPITestCase(TestCase):
             reason="Dashboard test",
             status=Appointment.Status.COMPLETED,
         )
-        Invoice.objects.create(appointment=appointment, amount=1000, tax=100, discount=100, status="PAID")
+        Invoice.objects.create(appointment=appointment, consultation_fee=1000, tax=100, discount_percent=10, status="PAID")
 
         self.auth("admin@example.com", "adminpass123")
         first = self.client.get("/api/v1/dashboard/overview/")
@@ -253,3 +273,890 @@ class HospitalAPITestCase(TestCase):
             format="json",
         )
         self.assertEqual(response.status_code, 403)
+
+    def test_appointment_list_uses_cursor_pagination(self):
+        start = timezone.now() + timedelta(days=1)
+        for i in range(3):
+            Appointment.objects.create(
+                doctor=self.doctor,
+                patient=self.patient,
+                start_time=start + timedelta(hours=i),
+                end_time=start + timedelta(hours=i, minutes=30),
+                reason=f"Visit {i}",
+            )
+        self.auth("admin@example.com", "adminpass123")
+
+        first_page = self.client.get("/api/v1/appointments/", {"page_size": 2})
+        self.assertEqual(first_page.status_code, 200, first_page.data)
+        self.assertEqual([a["reason"] for a in first_page.data["results"]], ["Visit 2", "Visit 1"])
+        self.assertIsNotNone(first_page.data["next"])
+
+        second_page = self.client.get(first_page.data["next"])
+        self.assertEqual(second_page.status_code, 200, second_page.data)
+        self.assertEqual([a["reason"] for a in second_page.data["results"]], ["Visit 0"])
+        self.assertIsNone(second_page.data["next"])
+
+    def test_patient_double_booking_rejected_and_cancelled_slots_reusable(self):
+        other_doctor_user = User.objects.create_user(
+            email="doctor2@example.com",
+            password="doctor2pass123",
+            full_name="Doctor Two",
+            role=User.Role.DOCTOR,
+        )
+        other_doctor = Doctor.objects.create(user=other_doctor_user, specialization="Neurology", license_number="LIC-002")
+        start = timezone.now() + timedelta(days=1)
+        end = start + timedelta(minutes=30)
+        booked = Appointment.objects.create(doctor=self.doctor, patient=self.patient, start_time=start, end_time=end)
+
+        self.auth("patient@example.com", "patientpass123")
+        clash = self.client.post(
+            "/api/v1/appointments/",
+            {"doctor": other_doctor.id, "start_time": start.isoformat(), "end_time": end.isoformat()},
+            format="json",
+        )
+        self.assertEqual(clash.status_code, 400)
+        self.assertEqual(clash.data["non_field_errors"], ["Patient has overlapping appointment"])
+
+        booked.status = Appointment.Status.CANCELLED
+        booked.save()
+        rebooked = self.client.post(
+            "/api/v1/appointments/",
+            {"doctor": self.doctor.id, "start_time": start.isoformat(), "end_time": end.isoformat()},
+            format="json",
+        )
+        self.assertEqual(rebooked.status_code, 201, rebooked.data)
+
+    def test_available_slots_skip_booked_intervals(self):
+        day = (timezone.now() + timedelta(days=7)).replace(hour=0, minute=0, second=0, microsecond=0)
+        WorkingHours.objects.create(
+            doctor=self.doctor, weekday=day.weekday(), start_time=time(9), end_time=time(10, 30)
+        )
+        Appointment.objects.create(
+            doctor=self.doctor,
+            patient=self.patient,
+            start_time=day + timedelta(hours=9, minutes=30),
+            end_time=day + timedelta(hours=10),
+        )
+        retired = User.objects.create_user(
+            email="retired@example.com", password="retiredpass123", full_name="Retired Doctor",
+            role=User.Role.DOCTOR, is_active=False,
+        )
+        Doctor.objects.create(user=retired, specialization="Cardiology", license_number="LIC-009")
+
+        self.auth("patient@example.com", "patientpass123")
+        response = self.client.get(
+            "/api/v1/doctors/available-slots/",
+            {
+                "specialization": "cardiology",
+                "from": day.isoformat(),
+                "to": (day + timedelta(days=1)).isoformat(),
+                "duration": 30,
+            },
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(len(response.data), 1)
+        slots = [(slot["start"], slot["end"]) for slot in response.data[0]["slots"]]
+        self.assertEqual(
+            slots,
+            [
+                (day + timedelta(hours=9), day + timedelta(hours=9, minutes=30)),
+                (day + timedelta(hours=10), day + timedelta(hours=10, minutes=30)),
+            ],
+        )
+
+        # A window opening mid-interval starts on the next slot boundary, not at its own instant.
+        response = self.client.get("/api/v1/doctors/available-slots/", {
+            "from": (day + timedelta(hours=9, minutes=1, microseconds=500)).isoformat(),
+            "to": (day + timedelta(days=1)).isoformat(),
+            "duration": 15,
+        })
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([slot["start"] for slot in response.data[0]["slots"]], [
+            day + timedelta(hours=9, minutes=15), day + timedelta(hours=10), day + timedelta(hours=10, minutes=15),
+        ])
+
+    def test_dashboard_overview_cache_invalidated_by_payment(self):
+        appointment = Appointment.objects.create(
+            doctor=self.doctor,
+            patient=self.patient,
+            start_time=timezone.now() + timedelta(days=1),
+            end_time=timezone.now() + timedelta(days=1, minutes=30),
+        )
+        invoice = Invoice.objects.create(appointment=appointment, consultation_fee=500)
+
+        self.auth("admin@example.com", "adminpass123")
+        before = self.client.get("/api/v1/dashboard/overview/")
+        self.assertEqual(before.data["pending_count"], 1)
+        with self.assertNumQueries(0):
+            self.client.get("/api/v1/dashboard/overview/")
+
+        invoice.status = Invoice.Status.PAID
+        with self.captureOnCommitCallbacks() as callbacks:
+            invoice.save()
+        self.assertTrue(callbacks)  # bumped again once the payment is visible to other workers
+        after = self.client.get("/api/v1/dashboard/overview/")
+        self.assertEqual(after.data["pending_count"], 0)
+        self.assertEqual(after.data["paid_count"], 1)
+        self.assertEqual(Decimal(after.data["revenue_paid_total"]), Decimal("500"))
+
+        # Profile edits leave the per-role counts alone; a role change does not.
+        self.patient_user.full_name = "Renamed Patient"
+        self.patient_user.save()
+        with self.assertNumQueries(0):
+            self.client.get("/api/v1/dashboard/overview/")
+        self.patient_user.role = User.Role.DOCTOR
+        self.patient_user.save()
+        self.assertEqual(self.client.get("/api/v1/dashboard/overview/").data["users_by_role"]["DOCTOR"], 2)
+
+    def test_cached_authentication_sees_deactivation_immediately(self):
+        self.auth("patient@example.com", "patientpass123")
+        self.assertEqual(self.client.get("/api/v1/appointments/").status_code, 200)
+        with self.assertNumQueries(1):  # the appointment page; the user comes from cache
+            self.client.get("/api/v1/appointments/")
+
+        self.patient_user.is_active = False
+        self.patient_user.save()
+        response = self.client.get("/api/v1/appointments/")
+        self.assertEqual(response.status_code, 401)
+
+        # A request that re-caches the row as it was before the deactivation committed is
+        # dropped by the bump that runs on commit.
+        self.patient_user.is_active = True
+        self.patient_user.save()
+        self.assertEqual(self.client.get("/api/v1/appointments/").status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.patient_user.is_active = False
+            self.patient_user.save()
+            stale = dict(load_user_payload(self.patient_user.id), is_active=True)
+            version = get_version(f"auth_user:{self.patient_user.id}")
+            cache.set(f"auth_user:{self.patient_user.id}:v{version}", stale, 60)
+        self.assertEqual(self.client.get("/api/v1/appointments/").status_code, 401)
+
+    def test_access_token_carries_role_and_profile_claims(self):
+        tokens = self.auth("doctor@example.com", "doctorpass123")
+        claims = AccessToken(tokens["access"])
+        self.assertEqual(claims["role"], "DOCTOR")
+        self.assertEqual(claims["doctor_id"], self.doctor.id)
+        self.assertIsNone(claims["patient_id"])
+
+        other_user = User.objects.create_user(
+            email="other@example.com", password="otherpass123", full_name="Other Doctor", role=User.Role.DOCTOR
+        )
+        other = Doctor.objects.create(
+            user=other_user, specialization="Dermatology", license_number="LIC-002", consultation_fee=300
+        )
+        start = timezone.now() + timedelta(days=1)
+        mine = Appointment.objects.create(
+            doctor=self.doctor, patient=self.patient, start_time=start, end_time=start + timedelta(minutes=30)
+        )
+        Appointment.objects.create(
+            doctor=other, patient=self.patient, start_time=start + timedelta(hours=1),
+            end_time=start + timedelta(hours=1, minutes=30),
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/v1/appointments/")
+        self.assertEqual([row["id"] for row in response.data["results"]], [mine.id])
+        self.assertIn(f'"doctor_id" = {self.doctor.id}', queries[-1]["sql"])
+
+        # Scoping follows the current profile, not the one recorded in the token.
+        tokens = self.auth("other@example.com", "otherpass123")
+        self.assertEqual(AccessToken(tokens["access"])["doctor_id"], other.id)
+        other.delete()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/v1/appointments/")
+        self.assertEqual(response.data["results"], [])
+        self.assertNotIn(f'"doctor_id" = {other.id}', queries[-1]["sql"])
+
+    def test_system_settings_served_from_cache_until_updated(self):
+        self.auth("admin@example.com", "adminpass123")
+        self.assertEqual(self.client.get("/api/v1/settings/").status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/v1/settings/")
+        self.assertEqual(Decimal(response.data["discount_percent"]), Decimal("0"))
+
+        updated = self.client.put("/api/v1/settings/", {"discount_percent": "15.00"}, format="json")
+        self.assertEqual(updated.status_code, 200, updated.data)
+        self.assertEqual(Decimal(self.client.get("/api/v1/settings/").data["discount_percent"]), Decimal("15"))
+        self.assertEqual(SystemSettings.get_settings().discount_percent, Decimal("15"))
+
+    def test_discount_change_reprices_pending_invoices_in_bulk(self):
+        invoices = []
+        for day, status in [(1, Invoice.Status.PENDING), (2, Invoice.Status.PENDING), (3, Invoice.Status.PAID)]:
+            start = timezone.now() + timedelta(days=day)
+            appointment = Appointment.objects.create(
+                doctor=self.doctor, patient=self.patient, start_time=start, end_time=start + timedelta(minutes=30)
+            )
+            invoices.append(Invoice.objects.create(
+                appointment=appointment, consultation_fee=500, medicine_total="33.30", tax=4, status=status
+            ))
+
+        self.auth("admin@example.com", "adminpass123")
+        self.client.get("/api/v1/dashboard/overview/")
+        response = self.client.put(
+            "/api/v1/settings/", {"discount_percent": "12.50", "apply_to_pending": True}, format="json"
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(response.data["repriced_invoices"], 2)
+
+        for invoice in invoices:
+            invoice.refresh_from_db()
+            expected = Invoice(consultation_fee=invoice.consultation_fee, medicine_total=invoice.medicine_total,
+                               tax=invoice.tax, discount_percent=invoice.discount_percent)
+            expected.calculate_totals()
+            self.assertEqual((invoice.discount_amount, invoice.total_amount),
+                             (expected.discount_amount, expected.total_amount))
+        self.assertEqual(invoices[0].discount_amount, Decimal("66.66"))
+        self.assertEqual(invoices[2].discount_percent, Decimal("0"))
+
+        overview = self.client.get("/api/v1/dashboard/overview/").data
+        self.assertEqual(Decimal(overview["pending_amount"]), 2 * invoices[0].total_amount)
+        call_command("reprice_pending_invoices", discount="0", stdout=StringIO())
+        self.assertEqual(Invoice.objects.filter(discount_amount=0).count(), 3)
+
+    def test_bulk_reprice_rounds_half_cent_discounts_like_calculate_totals(self):
+        # Each subtotal's 5% discount ends in exactly half a cent; SQLite does this arithmetic in floats.
+        subtotals = ["0.10", "100.10", "2469.30", "1000000.50", "99999999.90"]
+        invoices = []
+        for day, subtotal in enumerate(subtotals, start=1):
+            start = timezone.now() + timedelta(days=day)
+            appointment = Appointment.objects.create(
+                doctor=self.doctor, patient=self.patient, start_time=start, end_time=start + timedelta(minutes=30)
+            )
+            invoices.append(Invoice.objects.create(
+                appointment=appointment, consultation_fee=0, medicine_total=subtotal, tax="0.07"
+            ))
+
+        self.assertEqual(Invoice.objects.reprice_pending(Decimal("5")), len(subtotals))
+        for invoice in invoices:
+            invoice.refresh_from_db()
+            expected = Invoice(consultation_fee=invoice.consultation_fee, medicine_total=invoice.medicine_total,
+                               tax=invoice.tax, discount_percent=invoice.discount_percent)
+            expected.calculate_totals()
+            self.assertEqual((invoice.discount_amount, invoice.total_amount),
+                             (expected.discount_amount, expected.total_amount))
+        self.assertEqual([invoice.discount_amount for invoice in invoices], [
+            Decimal("0.01"), Decimal("5.01"), Decimal("123.47"), Decimal("50000.03"), Decimal("5000000.00"),
+        ])
+
+    @override_settings(IDEMPOTENCY_WAIT_SECONDS=0.1)
+    def test_idempotency_key_replays_first_response(self):
+        self.auth("patient@example.com", "patientpass123")
+        start = timezone.now() + timedelta(days=3)
+        body = {"doctor": self.doctor.id, "start_time": start.isoformat(),
+                "end_time": (start + timedelta(minutes=30)).isoformat(), "reason": "Checkup"}
+
+        location = {"Location": "/api/v1/appointments/1/"}
+        with mock.patch.object(AppointmentListCreateView, "get_success_headers", return_value=location):
+            first = self.client.post("/api/v1/appointments/", body, format="json", HTTP_IDEMPOTENCY_KEY="booking-1")
+        self.assertEqual(first.status_code, 201, first.data)
+        with self.assertNumQueries(0):
+            replay = self.client.post("/api/v1/appointments/", body, format="json", HTTP_IDEMPOTENCY_KEY="booking-1")
+        self.assertEqual((replay.status_code, replay.json()["id"]), (201, first.data["id"]))
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+        for header in ("Location", "Content-Type", "Allow", "Vary"):
+            self.assertEqual(replay[header], first[header])
+        self.assertIn('desc="0 queries"', replay["Server-Timing"])  # timed afresh, not copied
+        self.assertEqual(Appointment.objects.count(), 1)
+
+        other_body = {**body, "reason": "Something else"}
+        reused = self.client.post("/api/v1/appointments/", other_body, format="json", HTTP_IDEMPOTENCY_KEY="booking-1")
+        self.assertEqual(reused.status_code, 422)
+
+        # The first request finished between a duplicate's lookup and its lock: replay, don't re-run.
+        real_get = cache.get
+        missed = []
+
+        def miss_once(key, *args, **kwargs):
+            if key.startswith("idempotency:") and not missed:
+                missed.append(key)
+                return None
+            return real_get(key, *args, **kwargs)
+
+        with mock.patch.object(cache, "get", side_effect=miss_once):
+            late = self.client.post("/api/v1/appointments/", body, format="json", HTTP_IDEMPOTENCY_KEY="booking-1")
+        self.assertEqual((late.status_code, late["Idempotent-Replayed"]), (201, "true"))
+        self.assertEqual(Appointment.objects.count(), 1)
+
+        # A duplicate that finds the first still running (lock taken) waits briefly, then backs off.
+        with mock.patch.object(cache, "add", return_value=False):
+            busy = self.client.post("/api/v1/appointments/", body, format="json", HTTP_IDEMPOTENCY_KEY="booking-2")
+        self.assertEqual((busy.status_code, busy["Retry-After"]), (409, "1"))
+        self.assertEqual(Appointment.objects.count(), 1)
+
+    def test_server_timing_reports_queries_and_budgets_fail_tests(self):
+        self.auth("doctor@example.com", "doctorpass123")
+        response = self.client.get("/api/v1/prescriptions/")
+        timing = dict(part.strip().split(";", 1) for part in response["Server-Timing"].split(","))
+        self.assertEqual(set(timing), {"db", "db-repeats", "serialize", "render", "app"})
+        self.assertRegex(timing["db"], r'dur=[\d.]+;desc="\d+ queries"')
+        self.assertRegex(timing["serialize"], r"dur=[\d.]+")
+
+        # Each listed object is timed once, by the repo's serializer base, and the times add up.
+        for day in (1, 2):
+            start = timezone.now() + timedelta(days=day)
+            Appointment.objects.create(
+                doctor=self.doctor, patient=self.patient, start_time=start, end_time=start + timedelta(minutes=30)
+            )
+        clock = mock.Mock(perf_counter=mock.Mock(side_effect=[0.0, 0.005, 0.005, 0.010]))
+        with mock.patch("common.serializers.time", clock):
+            response = self.client.get("/api/v1/appointments/")
+        self.assertIn("serialize;dur=10.0", response["Server-Timing"])
+
+        with mock.patch.object(PrescriptionListCreateView, "query_budget", {"GET": 0}):
+            with self.assertRaisesRegex(QueryBudgetExceeded, r"GET /api/v1/prescriptions/ ran \d+ queries \(budget 0\)"):
+                self.client.get("/api/v1/prescriptions/")
+
+    def test_signed_profile_header_captures_request_for_admins(self):
+        self.auth("admin@example.com", "adminpass123")
+        token = self.client.post("/api/v1/_debug/profiles/token/").data["token"]
+        self.assertNotIn("X-Profile-Id", self.client.get("/api/v1/prescriptions/", HTTP_X_PROFILE=token + "x"))
+
+        # The token only profiles requests made by the admin it was issued to.
+        self.auth("doctor@example.com", "doctorpass123")
+        self.assertNotIn("X-Profile-Id", self.client.get("/api/v1/prescriptions/", HTTP_X_PROFILE=token))
+        self.assertEqual(self.client.get("/api/v1/_debug/profiles/").status_code, 403)
+        self.client.credentials()
+        self.assertNotIn("X-Profile-Id", self.client.get("/api/v1/prescriptions/", HTTP_X_PROFILE=token))
+
+        self.auth("admin@example.com", "adminpass123")
+        with override_settings(PROFILE_TOP_N=1000):
+            response = self.client.get("/api/v1/prescriptions/", HTTP_X_PROFILE=token)
+        self.assertEqual(response.status_code, 200)
+        profile_id = response["X-Profile-Id"]
+        listed = self.client.get("/api/v1/_debug/profiles/").data
+        self.assertEqual(
+            [(p["id"], p["path"], p["trigger"]) for p in listed], [(int(profile_id), "/api/v1/prescriptions/", "header")]
+        )
+        self.assertNotIn("functions", listed[0])
+        detail = self.client.get(f"/api/v1/_debug/profiles/{profile_id}/").data
+        self.assertGreater(detail["queries"], 0)
+        self.assertEqual(set(detail["breakdown"]), {"db", "orm", "serializers", "render", "framework", "app"})
+        self.assertTrue(any("prescriptions/views.py" in row["function"] for row in detail["functions"]))
+        self.assertEqual(self.client.get("/api/v1/_debug/profiles/999/").status_code, 404)
+
+    def test_metrics_expose_per_view_latency_and_cache_results(self):
+        self.auth("doctor@example.com", "doctorpass123")
+        self.client.get("/api/v1/prescriptions/")
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="203.0.113.7").status_code, 403)
+
+        # Loopback needs no token; a proxy's private address does not count as internal.
+        self.client.credentials()
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="10.0.0.5").status_code, 401)
+        with override_settings(METRICS_SCRAPE_TOKEN="scrape-secret"):
+            self.assertEqual(
+                self.client.get("/metrics", REMOTE_ADDR="10.0.0.5", HTTP_AUTHORIZATION="Metrics wrong").status_code, 401
+            )
+            self.assertEqual(
+                self.client.get("/metrics", REMOTE_ADDR="10.0.0.5", HTTP_AUTHORIZATION="Metrics scrape-secret").status_code,
+                200,
+            )
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('http_request_duration_seconds_count{method="GET",status="200",view="prescription-list-create"}', body)
+        self.assertIn('http_request_db_queries_bucket{le="+Inf",method="GET",view="prescription-list-create"}', body)
+        self.assertIn('http_response_size_bytes_count{method="GET",view="prescription-list-create"}', body)
+        self.assertIn('django_cache_gets_total{result="hit"}', body)
+        self.assertIn("http_requests_in_flight 1.0", body)
+
+        self.auth("admin@example.com", "adminpass123")
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="203.0.113.7").status_code, 200)
+
+    def test_generate_dataset_bulk_creates_consistent_non_overlapping_data(self):
+        call_command(
+            "generate_dataset", doctors=3, patients=10, appointments=120, days=5, medicines=10,
+            chunk_size=50, password="loadtest123", seed=7, stdout=StringIO(),
+        )
+        generated = Appointment.objects.exclude(doctor__user__email="doctor@example.com")
+        self.assertEqual(generated.count(), 120)
+        live = generated.exclude(status=Appointment.Status.CANCELLED)
+        for field in ("doctor_id", "patient_id"):
+            self.assertFalse(live.values(field, "start_time").annotate(n=Count("id")).filter(n__gt=1).exists())
+        # Only on the doctors' working days (WorkingHours are Monday to Saturday).
+        starts = generated.values_list("start_time", flat=True)
+        self.assertNotIn(6, {timezone.localtime(start).weekday() for start in starts})
+        self.assertEqual(
+            Invoice.objects.count(), generated.filter(invoice__isnull=False, prescription__isnull=False).count()
+        )
+        invoice = Invoice.objects.order_by("id").first()
+        self.assertEqual(invoice.created_at, invoice.appointment.end_time)
+        rollup = DailyRevenue.objects.aggregate(count=Sum("invoice_count"), total=Sum("total_amount"))
+        invoices = Invoice.objects.aggregate(count=Count("id"), total=Sum("total_amount"))
+        self.assertEqual(rollup, invoices)
+
+        email = get_user_model().objects.filter(email__startswith="patient0.").values_list("email", flat=True).get()
+        self.auth(email, "loadtest123")
+
+    def test_prescription_create_query_count_independent_of_item_count(self):
+        medicines = [
+            Medicine.objects.create(name=f"Med {i}", price=10 + i, tax_percent=5) for i in range(20)
+        ]
+        SystemSettings.get_settings()
+        self.auth("doctor@example.com", "doctorpass123")
+
+        def prescribe(day, count):
+            appointment = Appointment.objects.create(
+                doctor=self.doctor,
+                patient=self.patient,
+                start_time=timezone.now() + timedelta(days=day),
+                end_time=timezone.now() + timedelta(days=day, minutes=30),
+            )
+            payload = {
+                "appointment": appointment.id,
+                "diagnosis": "Flu",
+                "medicines": [
+                    {"medicine": m.id, "quantity": 2, "dosage": "1 tablet", "frequency": "Daily"}
+                    for m in medicines[:count]
+                ],
+            }
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post("/api/v1/prescriptions/", payload, format="json")
+            self.assertEqual(response.status_code, 201, response.data)
+            self.assertEqual(len(response.data["items"]), count)
+            return len(queries), appointment
+
+        prescribe(1, 1)  # warm-up: creates today's revenue bucket
+        few, _ = prescribe(2, 2)
+        many, appointment = prescribe(3, 20)
+        self.assertEqual(few, many)
+
+        invoice = Invoice.objects.get(appointment=appointment)
+        expected_medicines = sum(Decimal(10 + i) * 2 for i in range(20))
+        self.assertEqual(invoice.medicine_total, expected_medicines)
+        self.assertEqual(invoice.tax, expected_medicines * 5 / 100)
+
+    def test_stock_tracked_prescription_query_count_independent_of_item_count(self):
+        expiry = timezone.localdate() + timedelta(days=30)
+        medicines = [
+            Medicine.objects.create(name=f"Tracked {i}", price=10, tax_percent=5, track_stock=True) for i in range(23)
+        ]
+        # Two units left in the earlier batch, so every line of three draws from both.
+        MedicineBatch.objects.bulk_create([
+            MedicineBatch(medicine=medicine, batch_number=number, expiry_date=expiry + timedelta(days=days),
+                          quantity_received=10, quantity_remaining=remaining)
+            for medicine in medicines
+            for number, days, remaining in [("A", 0, 2), ("B", 1, 10)]
+        ])
+        SystemSettings.get_settings()
+        self.auth("doctor@example.com", "doctorpass123")
+
+        def prescribe(day, lines):
+            start = timezone.now() + timedelta(days=day)
+            appointment = Appointment.objects.create(
+                doctor=self.doctor, patient=self.patient, start_time=start, end_time=start + timedelta(minutes=30)
+            )
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post("/api/v1/prescriptions/", {
+                    "appointment": appointment.id, "diagnosis": "Flu",
+                    "medicines": [
+                        {"medicine": m.id, "quantity": 3, "dosage": "1 tablet", "frequency": "Daily"} for m in lines
+                    ],
+                }, format="json")
+            # Going over the view's POST budget fails the request under QUERY_BUDGET_RAISE.
+            self.assertEqual(response.status_code, 201, response.data)
+            return len(queries)
+
+        budget = PrescriptionListCreateView.query_budget["POST"]
+        self.assertEqual(prescribe(1, medicines[:1]), budget)  # loads the user, creates today's revenue bucket
+        few = prescribe(2, medicines[1:3])
+        many = prescribe(3, medicines[3:])
+        self.assertEqual(few, many)
+        self.assertEqual(many, budget - 4)
+        self.assertEqual(set(MedicineBatch.objects.values_list("batch_number", "quantity_remaining")), {("A", 0), ("B", 9)})
+
+    def test_medicine_search_ranks_prefixes_tolerates_typos_and_tracks_writes(self):
+        Medicine.objects.create(name="Paracetamol 500", generic_name="Acetaminophen", price=5)
+        Medicine.objects.create(name="Pantoprazole", generic_name="Pantoprazole sodium", price=8)
+        Medicine.objects.create(name="Calpol", generic_name="Paracetamol", price=6)
+        hidden = Medicine.objects.create(name="Paracodin", price=9, is_active=False)
+
+        self.auth("doctor@example.com", "doctorpass123")
+        names = lambda q: [row["name"] for row in self.client.get(f"/api/v1/medicines/search/?q={q}").data]
+        self.assertEqual(names("para"), ["Paracetamol 500", "Calpol"])
+        self.assertEqual(set(names("paracetmol")), {"Paracetamol 500", "Calpol"})
+        self.assertEqual(names("acetam"), ["Paracetamol 500"])
+        with self.assertNumQueries(0):
+            names("pan")
+
+        hidden.is_active = True
+        hidden.save()
+        self.assertIn("Paracodin", names("para"))
+
+    def test_medicine_create_without_manufacturer(self):
+        self.auth("admin@example.com", "adminpass123")
+        created = self.client.post("/api/v1/medicines/", {"name": "Dolo 650", "price": "30.00"}, format="json")
+        self.assertEqual(created.status_code, 201, created.data)
+        self.assertEqual(created.data["manufacturer"], "")
+        duplicate = self.client.post("/api/v1/medicines/", {"name": "Dolo 650", "price": "31.00"}, format="json")
+        self.assertEqual(duplicate.status_code, 400)
+        self.assertIn("non_field_errors", duplicate.data)
+
+    def test_medicine_csv_import_upserts_and_reports_bad_rows(self):
+        Medicine.objects.create(name="Amoxicillin 250", manufacturer="Cipla", price=40)
+        csv_file = SimpleUploadedFile("prices.csv", (
+            "name,generic_name,manufacturer,category,price,tax_percent\n"
+            "Amoxicillin 250,Amoxicillin,Cipla,CAPSULE,42.50,12\n"
+            "Amoxicillin 250,Amoxicillin,Sun Pharma,CAPSULE,39.00,12\n"
+            "Cetirizine 10,Cetirizine,Cipla,TABLET,not-a-price,5\n"
+            "Omeprazole 20,,,,18,\n"
+        ).encode(), content_type="text/csv")
+
+        self.auth("admin@example.com", "adminpass123")
+        with self.assertNumQueries(6):  # user load, savepoint, existing keys, upsert, price history, release
+            response = self.client.post("/api/v1/medicines/import/", {"file": csv_file}, format="multipart")
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual((response.data["created"], response.data["updated"]), (2, 1))
+        self.assertEqual([error["row"] for error in response.data["errors"]], [4])
+        self.assertIn("price", response.data["errors"][0]["errors"])
+        self.assertEqual(Medicine.objects.get(name="Amoxicillin 250", manufacturer="Cipla").price, Decimal("42.50"))
+        self.assertEqual(Medicine.objects.get(name="Omeprazole 20").category, Medicine.Category.TABLET)
+        self.assertEqual(
+            [row["name"] for row in self.client.get("/api/v1/medicines/search/?q=omep").data], ["Omeprazole 20"]
+        )
+
+        # Keyed uploads are not read into memory by the idempotency middleware.
+        csv_file.seek(0)
+        with override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=50):
+            keyed = self.client.post(
+                "/api/v1/medicines/import/", {"file": csv_file}, format="multipart", HTTP_IDEMPOTENCY_KEY="import-1"
+            )
+        self.assertEqual((keyed.status_code, keyed.data["updated"]), (200, 3))
+
+        # A file that stops decoding or parsing is a 400 naming the line, with what was imported before it.
+        for content, row in [
+            (b"name,price\nIbuprofen 400,12\nCaf\xe9 Tonic,9\n", 3),
+            (b"name,price\nIbuprofen 400,12\n\"" + b"x" * (csv.field_size_limit() + 1) + b"\",9\n", 3),
+        ]:
+            broken = SimpleUploadedFile("prices.csv", content, content_type="text/csv")
+            response = self.client.post("/api/v1/medicines/import/", {"file": broken}, format="multipart")
+            self.assertEqual((response.status_code, response.data["row"]), (400, row), response.data)
+            self.assertIn(f"Line {row}", response.data["detail"])
+
+    def test_prescribing_draws_stock_fifo_and_rejects_shortfalls(self):
+        medicine = Medicine.objects.create(name="Insulin", price=300, tax_percent=5, reorder_level=5)
+        SystemSettings.get_settings()
+        today = timezone.localdate()
+        self.auth("admin@example.com", "adminpass123")
+        for number, expiry, quantity in [("EXP", -1, 50), ("LATE", 90, 10), ("SOON", 30, 3)]:
+            response = self.client.post(f"/api/v1/medicines/{medicine.id}/batches/", {
+                "batch_number": number, "expiry_date": str(today + timedelta(days=expiry)), "quantity_received": quantity,
+            }, format="json")
+            self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(self.client.get("/api/v1/medicines/low-stock/").data, [])
+
+        def prescribe(day, quantity):
+            start = timezone.now() + timedelta(days=day)
+            appointment = Appointment.objects.create(
+                doctor=self.doctor, patient=self.patient, start_time=start, end_time=start + timedelta(minutes=30)
+            )
+            return self.client.post("/api/v1/prescriptions/", {
+                "appointment": appointment.id, "diagnosis": "Diabetes",
+                "medicines": [{"medicine": medicine.id, "quantity": quantity, "dosage": "10u", "frequency": "Daily"}],
+            }, format="json")
+
+        self.assertEqual(prescribe(1, 5).status_code, 201)
+        remaining = dict(medicine.batches.values_list("batch_number", "quantity_remaining"))
+        self.assertEqual(remaining, {"EXP": 50, "SOON": 0, "LATE": 8})
+        item = PrescriptionItem.objects.get(medicine=medicine)
+        self.assertEqual(sorted(item.allocations.values_list("batch__batch_number", "quantity")), [("LATE", 2), ("SOON", 3)])
+
+        shortfall = prescribe(2, 9)
+        self.assertEqual(shortfall.status_code, 400)
+        self.assertIn("Insulin", str(shortfall.data["medicines"]))
+        self.assertEqual(medicine.batches.get(batch_number="LATE").quantity_remaining, 8)
+        self.assertEqual(PrescriptionItem.objects.count(), 1)
+
+        self.assertEqual(prescribe(3, 4).status_code, 201)
+        report = self.client.get("/api/v1/medicines/low-stock/").data
+        self.assertEqual([(row["name"], row["on_hand"]) for row in report], [("Insulin", 4)])
+
+    def test_price_history_answers_point_in_time_and_bulk_lookups(self):
+        self.auth("admin@example.com", "adminpass123")
+        created = self.client.post(
+            "/api/v1/medicines/", {"name": "Azithromycin", "price": "100.00", "tax_percent": "12.00"}, format="json"
+        )
+        self.assertEqual(created.status_code, 201, created.data)
+        medicine_id = created.data["id"]
+        MedicinePriceHistory.objects.filter(medicine_id=medicine_id).update(
+            effective_from=timezone.now() - timedelta(days=10)
+        )
+        self.client.patch(f"/api/v1/medicines/{medicine_id}/", {"price": "120.00"}, format="json")
+        self.client.patch(f"/api/v1/medicines/{medicine_id}/", {"is_active": False}, format="json")
+
+        history = self.client.get(f"/api/v1/medicines/{medicine_id}/price-history/").data["results"]
+        self.assertEqual([entry["price"] for entry in history], ["120.00", "100.00"])
+        five_days_ago = (timezone.now() - timedelta(days=5)).isoformat()
+        at = self.client.get(f"/api/v1/medicines/{medicine_id}/price-history/", {"at": five_days_ago}).data
+        self.assertEqual([entry["price"] for entry in at["results"]], ["100.00"])
+
+        items = [
+            {"medicine": medicine_id, "at": (timezone.now() - timedelta(days=days)).isoformat()}
+            for days in (20, 5, 0)
+        ] * 500
+        with self.assertNumQueries(1):
+            response = self.client.post("/api/v1/medicines/prices-as-of/", {"items": items}, format="json")
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([row["price"] for row in response.data[:3]], [None, "100.00", "120.00"])
+        self.assertEqual(len(response.data), 1500)
+
+    def test_prescription_rejects_unknown_medicine(self):
+        appointment = Appointment.objects.create(
+            doctor=self.doctor,
+            patient=self.patient,
+            start_time=timezone.now() + timedelta(days=1),
+            end_time=timezone.now() + timedelta(days=1, minutes=30),
+        )
+        self.auth("doctor@example.com", "doctorpass123")
+        response = self.client.post(
+            "/api/v1/prescriptions/",
+            {
+                "appointment": appointment.id,
+                "diagnosis": "Flu",
+                "medicines": [{"medicine": 9999, "dosage": "1 tablet", "frequency": "Daily"}],
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("medicine", response.data["medicines"][0])
+
+    def test_invoice_export_streams_csv_and_ndjson_with_role_scoping(self):
+        appointment = Appointment.objects.create(
+            doctor=self.doctor,
+            patient=self.patient,
+            start_time=timezone.now() + timedelta(days=1),
+            end_time=timezone.now() + timedelta(days=1, minutes=30),
+        )
+        Invoice.objects.create(appointment=appointment, consultation_fee=500, status="PAID")
+
+        self.auth("admin@example.com", "adminpass123")
+        response = self.client.get("/api/v1/invoices/export/", {"format": "csv", "status": "PAID"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn("doctor_name", lines[0])
+        self.assertIn("Doctor User", lines[1])
+
+        response = self.client.get("/api/v1/invoices/export/", {"format": "ndjson"})
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(rows[0]["patient_name"], "Patient User")
+
+        # Accept headers naming neither format fall back to ?format=, else CSV; unknown formats are 404.
+        response = self.client.get("/api/v1/invoices/export/", HTTP_ACCEPT="application/json")
+        self.assertEqual((response.status_code, response["Content-Type"]), (200, "text/csv"))
+        response = self.client.get("/api/v1/invoices/export/", {"format": "ndjson"}, HTTP_ACCEPT="application/json")
+        self.assertEqual((response.status_code, response["Content-Type"]), (200, "application/x-ndjson"))
+        self.assertEqual(self.client.get("/api/v1/invoices/export/", {"format": "xml"}).status_code, 404)
+
+        other_patient_user = User.objects.create_user(
+            email="patient2@example.com", password="patient2pass123", full_name="Patient Two", role=User.Role.PATIENT
+        )
+        Patient.objects.create(user=other_patient_user)
+        self.auth("patient2@example.com", "patient2pass123")
+        response = self.client.get("/api/v1/invoices/export/", {"format": "ndjson"})
+        self.assertEqual(b"".join(response.streaming_content), b"")
+
+    def test_daily_revenue_rollup_follows_invoice_lifecycle(self):
+        appointment = Appointment.objects.create(
+            doctor=self.doctor,
+            patient=self.patient,
+            start_time=timezone.now() + timedelta(days=1),
+            end_time=timezone.now() + timedelta(days=1, minutes=30),
+        )
+        invoice = Invoice.objects.create(appointment=appointment, consultation_fee=500, tax=50)
+
+        def buckets():
+            return {
+                row.status: (row.invoice_count, row.total_amount)
+                for row in DailyRevenue.objects.filter(doctor=self.doctor)
+            }
+
+        self.assertEqual(buckets(), {"PENDING": (1, Decimal("550.00"))})
+
+        self.auth("admin@example.com", "adminpass123")
+        response = self.client.patch(f"/api/v1/invoices/{invoice.id}/status/", {"status": "PAID"}, format="json")
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(buckets(), {"PENDING": (0, Decimal("0.00")), "PAID": (1, Decimal("550.00"))})
+
+        DailyRevenue.objects.all().delete()
+        call_command("rebuild_revenue_rollup", stdout=StringIO())
+        self.assertEqual(buckets(), {"PAID": (1, Decimal("550.00"))})
+
+        appointment.delete()
+        self.assertEqual(buckets(), {"PAID": (0, Decimal("0.00"))})
+
+    def test_patient_payment_is_a_single_compare_and_set(self):
+        start = timezone.now() + timedelta(days=1)
+        appointment = Appointment.objects.create(
+            doctor=self.doctor, patient=self.patient, start_time=start, end_time=start + timedelta(minutes=30)
+        )
+        invoice = Invoice.objects.create(appointment=appointment, consultation_fee=500, tax=50)
+
+        self.auth("patient@example.com", "patientpass123")
+        url = f"/api/v1/invoices/{invoice.id}/status/"
+        self.client.get("/api/v1/auth/me/")
+        # Conditional UPDATE, rollup read, two bucket UPDATEs and a first-time PAID bucket INSERT,
+        # plus their savepoints; no invoice is loaded before the UPDATE.
+        with self.assertNumQueries(9):
+            paid = self.client.patch(url, {"status": "PAID", "payment_method": "UPI"}, format="json")
+        self.assertEqual(paid.status_code, 200, paid.data)
+        self.assertEqual((paid.data["status"], paid.data["payment_method"]), ("PAID", "UPI"))
+        invoice.refresh_from_db()
+        self.assertEqual((invoice.status, invoice.payment_method), (Invoice.Status.PAID, "UPI"))
+        self.assertEqual(
+            dict(DailyRevenue.objects.values_list("status", "invoice_count")), {"PENDING": 0, "PAID": 1}
+        )
+
+        again = self.client.patch(url, {"status": "PAID"}, format="json")
+        self.assertEqual(again.status_code, 409)
+
+        User.objects.create_user(email="other@example.com", password="otherpass123", full_name="Other")
+        self.auth("other@example.com", "otherpass123")
+        self.assertEqual(self.client.patch(url, {"status": "PAID"}, format="json").status_code, 403)
+        self.assertEqual(self.client.patch("/api/v1/invoices/999999/status/", {}, format="json").status_code, 404)
+
+    def test_revenue_series_buckets_by_month_and_doctor(self):
+        invoices = []
+        for day in (1, 2):
+            appointment = Appointment.objects.create(
+                doctor=self.doctor,
+                patient=self.patient,
+                start_time=timezone.now() + timedelta(days=day),
+                end_time=timezone.now() + timedelta(days=day, minutes=30),
+            )
+            invoices.append(Invoice.objects.create(appointment=appointment, consultation_fee=100 * day))
+        invoices[0].status = Invoice.Status.PAID
+        invoices[0].save()
+        Invoice.objects.filter(pk=invoices[1].pk).update(created_at=timezone.now() - timedelta(days=40))
+        DailyRevenue.objects.rebuild()
+
+        self.auth("admin@example.com", "adminpass123")
+        response = self.client.get(
+            "/api/v1/analytics/revenue/",
+            {"granularity": "month", "group_by": "doctor", "from": (timezone.localdate() - timedelta(days=60)).isoformat()},
+        )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            [(row["group_name"], row["paid_total"], row["pending_total"]) for row in response.data],
+            [("Doctor User", "0.00", "200.00"), ("Doctor User", "100.00", "0.00")],
+        )
+        self.assertEqual(response.data[1]["period"], timezone.localdate().replace(day=1))
+
+    def test_doctor_utilization_metrics(self):
+        day = (timezone.now() - timedelta(days=2)).replace(hour=9, minute=0, second=0, microsecond=0)
+        for offset, minutes, status in [
+            (0, 30, Appointment.Status.COMPLETED),
+            (60, 30, Appointment.Status.NO_SHOW),
+            (90, 30, Appointment.Status.COMPLETED),
+            (120, 30, Appointment.Status.CANCELLED),
+        ]:
+            Appointment.objects.create(
+                doctor=self.doctor,
+                patient=self.patient,
+                start_time=day + timedelta(minutes=offset),
+                end_time=day + timedelta(minutes=offset + minutes),
+                status=status,
+            )
+
+        self.auth("admin@example.com", "adminpass123")
+        response = self.client.get("/api/v1/analytics/utilization/", {"peak_hours": 1})
+        self.assertEqual(response.status_code, 200, response.data)
+        [row] = response.data
+        self.assertEqual(row["doctor_name"], "Doctor User")
+        self.assertEqual(row["appointments"], 4)
+        self.assertEqual(row["booked_minutes"], 90.0)
+        self.assertEqual((row["idle_minutes"], row["idle_gaps"]), (30.0, 1))
+        self.assertAlmostEqual(row["no_show_rate"], 1 / 3, places=3)
+        self.assertEqual(row["peak_hours"], [{"hour": 10, "appointments": 2}])
+
+
+@override_settings(QUERY_BUDGET_RAISE=True)
+class StockConcurrencyTestCase(TransactionTestCase):
+    """Real commits, so a second connection sees only what the first has committed."""
+
+    def setUp(self):
+        cache.clear()
+        doctor_user = User.objects.create_user(
+            email="doctor@example.com", password="doctorpass123", full_name="Doctor User", role=User.Role.DOCTOR
+        )
+        self.doctor = Doctor.objects.create(user=doctor_user, specialization="Cardiology", license_number="LIC-001")
+        patient_user = User.objects.create_user(
+            email="patient@example.com", password="patientpass123", full_name="Patient User", role=User.Role.PATIENT
+        )
+        self.patient = Patient.objects.create(user=patient_user)
+        medicine = Medicine.objects.create(name="Insulin", price=300, tax_percent=5, track_stock=True)
+        self.batch = MedicineBatch.objects.create(
+            medicine=medicine, batch_number="B1", expiry_date=timezone.localdate() + timedelta(days=30),
+            quantity_received=10, quantity_remaining=10,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(doctor_user)
+
+    def prescribe(self, day, quantity):
+        start = timezone.now() + timedelta(days=day)
+        appointment = Appointment.objects.create(
+            doctor=self.doctor, patient=self.patient, start_time=start, end_time=start + timedelta(minutes=30)
+        )
+        return self.client.post("/api/v1/prescriptions/", {
+            "appointment": appointment.id, "diagnosis": "Diabetes",
+            "medicines": [{"medicine": self.batch.medicine_id, "quantity": quantity, "dosage": "10u", "frequency": "Daily"}],
+        }, format="json")
+
+    def committed_remaining(self):
+        """The batch as another connection sees it while this one's transaction is open."""
+        seen = []
+
+        def read():
+            try:
+                seen.append(MedicineBatch.objects.get(pk=self.batch.pk).quantity_remaining)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=read)
+        thread.start()
+        thread.join()
+        return seen[0]
+
+    def test_open_prescription_transaction_holds_no_stock_lock(self):
+        seen = []
+
+        def generate_invoice(view, prescription):
+            # Runs inside the prescription's transaction; the second prescription then fails.
+            seen.append(self.committed_remaining())
+            if len(seen) == 2:
+                raise RuntimeError("invoice failed")
+
+        with mock.patch.object(PrescriptionListCreateView, "_generate_invoice", generate_invoice):
+            self.assertEqual(self.prescribe(1, 3).status_code, 201)
+            with self.assertRaises(RuntimeError):
+                self.prescribe(2, 4)
+
+        # Each draw was committed before the transaction opened; the failed one was given back.
+        self.assertEqual(seen, [7, 3])
+        self.batch.refresh_from_db()
+        self.assertEqual(self.batch.quantity_remaining, 7)
+        self.assertEqual(Prescription.objects.count(), 1)
+
+    def test_draw_that_loses_a_race_is_planned_again(self):
+        later = MedicineBatch.objects.create(
+            medicine_id=self.batch.medicine_id, batch_number="B2", expiry_date=timezone.localdate() + timedelta(days=90),
+            quantity_received=10, quantity_remaining=10,
+        )
+        plan, raced = stock._plan, []
+
+        def plan_then_race(demand, rows):
+            planned = plan(demand, rows)
+            if not raced:  # another prescription empties most of B1 before our UPDATE
+                raced.append(True)
+                MedicineBatch.objects.filter(pk=self.batch.pk).update(quantity_remaining=F("quantity_remaining") - 9)
+            return planned
+
+        with mock.patch.object(stock, "_plan", plan_then_race):
+            allocations = stock.allocate([("line", self.batch.medicine_id, 3)])
+        self.assertEqual(allocations, {"line": [(self.batch.pk, 1), (later.pk, 2)]})
+        remaining = dict(MedicineBatch.objects.values_list("batch_number", "quantity_remaining"))
+        self.assertEqual(remaining, {"B1": 0, "B2": 8})
+
+        stock.release(allocations)
+        remaining = dict(MedicineBatch.objects.values_list("batch_number", "quantity_remaining"))
+        self.assertEqual(remaining, {"B1": 1, "B2": 10})